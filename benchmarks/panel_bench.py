@@ -0,0 +1,391 @@
+"""Benchmark de carga do painel (REST e Socket.IO).
+
+Sobe uma instância local do painel a partir de uma cópia temporária de
+``src/`` e ``static/``, com um ``NAZUNA_DIR`` também temporário (ou mede
+uma instância já em execução com ``--url``), executa cada cenário com
+N clientes simultâneos por alguns segundos e imprime um JSON com vazão e
+latências (p50/p95/p99) para comparar versões e escolher a quantidade de
+workers em produção.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/panel_bench.py --production --concurrency 1,8,32 --output resultado.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import signal
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+import requests
+import socketio
+
+PANEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_FILE_SIZE = 64 * 1024
+DOWNLOAD_FILE_SIZE = 1024 * 1024
+LIST_FILES = 200
+STATIC_ASSET = 'index.html'
+SOCKET_TIMEOUT = 10          # segundos esperando a resposta de um evento
+READY_TIMEOUT = 30           # segundos esperando o painel subir
+SETUP_TIMEOUT = 60           # segundos esperando o shell de cada sessão de terminal iniciar
+
+BENCH_CONFIG = {
+    'nomebot': 'Bench',
+    'prefixo': '!',
+    'nomedono': 'Bench',
+    'numerodono': '5500000000000',
+    'aviso': False,
+    'debug': False
+}
+
+def prepare_base_dir(root):
+    """Cria uma pasta do bot mínima com os arquivos usados pelos cenários"""
+    os.makedirs(os.path.join(root, 'dados', 'src'), exist_ok=True)
+    with open(os.path.join(root, 'dados', 'src', 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(BENCH_CONFIG, f, indent=2)
+
+    bench_dir = os.path.join(root, 'bench')
+    os.makedirs(bench_dir, exist_ok=True)
+    for i in range(LIST_FILES):
+        with open(os.path.join(bench_dir, f'arquivo-{i:03d}.txt'), 'w') as f:
+            f.write(f'arquivo {i}\n')
+
+    line = 'nazuna bench ' * 7 + '\n'
+    with open(os.path.join(bench_dir, 'leitura.txt'), 'w') as f:
+        f.write((line * (READ_FILE_SIZE // len(line) + 1))[:READ_FILE_SIZE])
+    with open(os.path.join(bench_dir, 'download.bin'), 'wb') as f:
+        f.write(random.randbytes(DOWNLOAD_FILE_SIZE))
+
+def prepare_panel_copy(root):
+    """Copia o painel para ``root``: ``data/``, ``logs/``, ``backups/``, os bancos
+    SQLite e as variantes comprimidas de ``static/`` ficam na cópia, não no painel real"""
+    ignore = shutil.ignore_patterns('__pycache__', '*.pyc', '*.gz', '*.br', 'search_index.db*')
+    for name in ('src', 'static'):
+        shutil.copytree(os.path.join(PANEL_DIR, name), os.path.join(root, name), ignore=ignore)
+    for name in ('data', 'logs', 'backups'):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class PanelProcess:
+    """Painel rodando em um subprocesso, encerrado junto com o grupo de processos"""
+
+    def __init__(self, panel_dir, base_dir, port, production):
+        self.url = f'http://127.0.0.1:{port}'
+        self.log_path = os.path.join(panel_dir, 'panel.log')
+        env = dict(os.environ,
+                   NAZUNA_DIR=base_dir,
+                   BACKUP_INTERVAL='0',
+                   PANEL_MODE='production' if production else 'development')
+        self.log = open(self.log_path, 'wb')
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join('src', 'main.py'), '--host', '127.0.0.1', '--port', str(port)],
+            cwd=panel_dir,
+            env=env,
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(f'{self.url}/api/bot/status', timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        # A pasta temporária é apagada no fim: mostra o final do log no erro
+        self.log.flush()
+        with open(self.log_path, 'rb') as f:
+            tail = f.read()[-2000:].decode('utf-8', 'replace')
+        raise RuntimeError(f'O painel não respondeu:\n{tail}')
+
+    def stop(self):
+        # O modo de desenvolvimento usa o reloader do Werkzeug: encerra o grupo todo
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+        except ProcessLookupError:
+            pass
+        self.log.close()
+
+# ---------------------------------------------------------------------------
+# Cenários: cada um recebe (url, índice do worker) e devolve ``(operação, fechar)``.
+# A operação executa uma requisição e levanta exceção em caso de falha.
+
+def rest_scenario(path, params=None):
+    def setup(url, worker):
+        session = requests.Session()
+
+        def op():
+            response = session.get(url + path, params=params, timeout=SOCKET_TIMEOUT)
+            response.raise_for_status()
+            response.content  # lê o corpo inteiro (downloads)
+
+        return op, session.close
+    return setup
+
+class SocketProbe:
+    """Cliente Socket.IO que mede o tempo entre emitir um evento e receber a resposta"""
+
+    def __init__(self, url, reply):
+        self.reply = reply
+        self.waiting = threading.Event()
+        self.matches = None
+        self.buffer = ''
+        self.error = None
+        self.client = socketio.Client(reconnection=False)
+        self.client.on(reply, self._on_reply)
+        self.client.on('error', self._on_error)
+        self.client.connect(url, transports=['websocket'], wait_timeout=SOCKET_TIMEOUT)
+
+    def _on_reply(self, data=None):
+        if self.matches is None:
+            self.waiting.set()
+            return
+        self.buffer += (data or {}).get('data', '')
+        if self.matches in self.buffer:
+            self.buffer = ''
+            self.waiting.set()
+
+    def _on_error(self, data=None):
+        self.error = (data or {}).get('message', 'erro')
+        self.waiting.set()
+
+    def roundtrip(self, event, data=None, matches=None, timeout=SOCKET_TIMEOUT):
+        self.waiting.clear()
+        self.matches = matches
+        self.error = None
+        if data is None:
+            self.client.emit(event)
+        else:
+            self.client.emit(event, data)
+        if not self.waiting.wait(timeout):
+            raise TimeoutError(f'Sem resposta para {event}')
+        if self.error:
+            raise RuntimeError(self.error)
+
+    def close(self):
+        self.client.disconnect()
+
+def socket_scenario(event, reply):
+    def setup(url, worker):
+        probe = SocketProbe(url, reply)
+        return (lambda: probe.roundtrip(event)), probe.close
+    return setup
+
+def terminal_scenario(url, worker):
+    """``terminal_input`` até a saída do comando chegar em ``terminal_output``"""
+    session_id = f'bench-{worker}-{os.getpid()}'
+    response = requests.post(f'{url}/api/terminal/create', json={'session_id': session_id, 'replace': True})
+    response.raise_for_status()
+
+    probe = SocketProbe(url, 'terminal_output')
+    # Entrada vazia só coloca o cliente na sala da sessão
+    probe.client.emit('terminal_input', {'session_id': session_id, 'input': ''})
+    counter = [0]
+
+    def op(timeout=SOCKET_TIMEOUT):
+        counter[0] += 1
+        n = counter[0]
+        # O eco do comando mostra "$((n))"; só a saída contém o número expandido
+        probe.roundtrip('terminal_input',
+                        {'session_id': session_id, 'input': f'echo bench$(({n}))fim\n'},
+                        matches=f'bench{n}fim', timeout=timeout)
+
+    def close():
+        probe.close()
+        requests.post(f'{url}/api/terminal/close', json={'session_id': session_id})
+
+    # O primeiro comando espera o shell iniciar; fica fora da medição
+    try:
+        op(timeout=SETUP_TIMEOUT)
+    except Exception:
+        close()
+        raise
+    return op, close
+
+SCENARIOS = {
+    'bot_status': rest_scenario('/api/bot/status'),
+    'files_list': rest_scenario('/api/files/list', {'path': 'bench'}),
+    'files_read': rest_scenario('/api/files/read', {'path': 'bench/leitura.txt'}),
+    'files_download': rest_scenario('/api/files/download', {'path': 'bench/download.bin'}),
+    'static': rest_scenario('/' + STATIC_ASSET),
+    'socket_get_system_info': socket_scenario('get_system_info', 'system_info'),
+    'socket_bot_status_request': socket_scenario('bot_status_request', 'bot_status_update'),
+    'socket_terminal_input': terminal_scenario
+}
+
+# ---------------------------------------------------------------------------
+
+def percentile(values, p):
+    """Percentil pelo método do rank mais próximo (``values`` ordenado)"""
+    if not values:
+        return None
+    index = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return values[min(index, len(values) - 1)]
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None)
+        }
+    }
+
+def run_scenario(url, setup, concurrency, duration, warmup):
+    """Executa ``concurrency`` workers; só contam as operações iniciadas na janela medida"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    window = {}
+
+    def open_window():
+        # Executado uma vez quando todos os workers terminaram a preparação
+        now = time.perf_counter()
+        window['start'] = now + warmup
+        window['end'] = now + warmup + duration
+
+    ready = threading.Barrier(concurrency + 1, action=open_window)
+
+    def worker(index):
+        try:
+            op, close = setup(url, index)
+        except Exception as e:
+            with lock:
+                errors[0] += 1
+            print(f'  worker {index}: erro na preparação: {e}', file=sys.stderr)
+            ready.wait()
+            return
+
+        local, failed = [], 0
+        try:
+            ready.wait()
+            start, end = window['start'], window['end']
+            while True:
+                began = time.perf_counter()
+                if began >= end:
+                    break
+                try:
+                    op()
+                except Exception:
+                    if began >= start:
+                        failed += 1
+                    continue
+                if began >= start:
+                    local.append(time.perf_counter() - began)
+        finally:
+            close()
+            with lock:
+                latencies.extend(local)
+                errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    # Os workers só começam depois que todos estão conectados
+    ready.wait()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], duration)
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PANEL_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga do painel (REST e Socket.IO)')
+    parser.add_argument('--url', help='instância já em execução (por padrão sobe uma cópia temporária do painel)')
+    parser.add_argument('--production', action='store_true', help='sobe o painel no modo gevent')
+    parser.add_argument('--concurrency', default='8', help='clientes simultâneos; lista separada por vírgula para comparar (ex.: 1,8,32)')
+    parser.add_argument('--duration', type=float, default=10, help='segundos medidos por cenário')
+    parser.add_argument('--warmup', type=float, default=1, help='segundos de aquecimento descartados por cenário')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='cenários separados por vírgula')
+    parser.add_argument('--output', help='grava o JSON neste arquivo (por padrão na saída padrão)')
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(unknown)}")
+
+    work_dir = panel = None
+    url = args.url.rstrip('/') if args.url else None
+    if url is None:
+        work_dir = tempfile.mkdtemp(prefix='nazuna-bench-')
+        base_dir = os.path.join(work_dir, 'nazuna')
+        panel_dir = os.path.join(work_dir, 'painel')
+        prepare_base_dir(base_dir)
+        prepare_panel_copy(panel_dir)
+        panel = PanelProcess(panel_dir, base_dir, free_port(), args.production)
+        url = panel.url
+
+    try:
+        if panel is not None:
+            panel.wait_ready()
+
+        results = []
+        for name in names:
+            for concurrency in levels:
+                print(f'{name} (concorrência {concurrency})...', file=sys.stderr)
+                stats = run_scenario(url, SCENARIOS[name], concurrency, args.duration, args.warmup)
+                results.append({'scenario': name, 'concurrency': concurrency, **stats})
+    finally:
+        if panel is not None:
+            panel.stop()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'url': args.url,
+            'mode': None if args.url else ('production' if args.production else 'development'),
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import os
+import sys
+import gzip
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+# Formatos aceitos e extensão do arquivo gerado
+ARCHIVE_FORMATS = {'zip': '.zip', 'tar.gz': '.tar.gz', 'tar': '.tar'}
+ARCHIVE_BLOCK = 256 * 1024
+ARCHIVE_QUEUE_SIZE = 16          # blocos em trânsito entre a thread escritora e o cliente
+ARCHIVE_PUT_TIMEOUT = 1
+ZIP64_THRESHOLD = 2 * 1024 * 1024 * 1024 - 1
+
+class ArchiveCancelled(Exception):
+    """O consumidor do stream desistiu (ex.: cliente desconectou)"""
+
+class _QueueWriter:
+    """Objeto ``file`` somente escrita que entrega os dados numa fila limitada.
+
+    Não tem ``seek``/``tell``, então ``zipfile`` usa descritores de dados e
+    ``tarfile`` o modo de stream; nada é reescrito depois de enviado.
+    """
+
+    def __init__(self, chunks, cancelled):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer.extend(data)
+        if len(self.buffer) >= ARCHIVE_BLOCK:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        block = bytes(self.buffer)
+        self.buffer.clear()
+        while True:
+            if self.cancelled.is_set():
+                raise ArchiveCancelled()
+            try:
+                self.chunks.put(block, timeout=ARCHIVE_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+class _PaddedReader:
+    """Lê exatamente ``size`` bytes de ``src`` para o ``tarfile``.
+
+    O cabeçalho tar já declarou o tamanho quando a cópia começa: se o
+    arquivo encolher ou a leitura falhar no meio, o restante é completado
+    com zeros (como o GNU tar) para o stream continuar alinhado.
+    """
+
+    def __init__(self, src, size):
+        self.src = src
+        self.remaining = size
+        self.problem = None
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = bytearray()
+        while len(data) < size and self.problem is None:
+            try:
+                block = self.src.read(size - len(data))
+            except OSError as e:
+                self.problem = e
+                break
+            if not block:
+                self.problem = 'arquivo encolheu durante a leitura'
+                break
+            data.extend(block)
+        self.remaining -= size
+        return bytes(data) + bytes(size - len(data))
+
+def iter_archive_files(root, exclude=()):
+    """Arquivos sob ``root`` como ``(caminho absoluto, nome no arquivo)``; ignora links simbólicos"""
+    base = os.path.basename(os.path.normpath(root))
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames
+                             if d not in exclude and not os.path.islink(os.path.join(dirpath, d)))
+        rel_dir = os.path.relpath(dirpath, root)
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            if os.path.islink(full_path):
+                continue
+            arcname = os.path.normpath(os.path.join(base, rel_dir, filename)).replace(os.sep, '/')
+            yield full_path, arcname
+
+def _write_zip(fileobj, root, level, exclude):
+    compression = zipfile.ZIP_STORED if level == 0 else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(fileobj, 'w', compression=compression,
+                         compresslevel=level if level else None, allowZip64=True) as zf:
+        for full_path, arcname in iter_archive_files(root, exclude):
+            try:
+                stat = os.stat(full_path)
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(stat.st_mtime, 315532800))[:6])
+                info.compress_type = compression
+                # ``zf.open(info)`` usa o nível do ZipInfo, não o ``compresslevel`` do ZipFile
+                if sys.version_info >= (3, 13):
+                    info.compress_level = level if level else None
+                else:
+                    info._compresslevel = level if level else None
+                info.external_attr = (stat.st_mode & 0xFFFF) << 16
+                with open(full_path, 'rb') as src, \
+                        zf.open(info, 'w', force_zip64=stat.st_size > ZIP64_THRESHOLD) as dest:
+                    for block in iter(lambda: src.read(ARCHIVE_BLOCK), b''):
+                        dest.write(block)
+            except OSError as e:
+                print(f"Erro ao adicionar {full_path} ao arquivo: {e}")
+
+def _write_tar(fileobj, root, level, exclude, compressed):
+    # O modo 'w|gz' do tarfile não aceita nível de compressão; o gzip é aplicado por fora
+    stream = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=level, mtime=0) if compressed else fileobj
+    try:
+        with tarfile.open(fileobj=stream, mode='w|') as tar:
+            for full_path, arcname in iter_archive_files(root, exclude):
+                # Abre e lê os metadados (fstat) antes de escrever o cabeçalho:
+                # um erro aqui só pula o arquivo, sem deixar o stream desalinhado
+                try:
+                    src = open(full_path, 'rb')
+                except OSError as e:
+                    print(f"Erro ao adicionar {full_path} ao arquivo: {e}")
+                    continue
+                with src:
+                    try:
+                        info = tar.gettarinfo(arcname=arcname, fileobj=src)
+                    except OSError as e:
+                        print(f"Erro ao adicionar {full_path} ao arquivo: {e}")
+                        continue
+                    reader = _PaddedReader(src, info.size)
+                    tar.addfile(info, reader)
+                    if reader.problem is not None:
+                        print(f"Erro ao ler {full_path}, completado com zeros no arquivo: {reader.problem}")
+    finally:
+        if compressed:
+            stream.close()
+
+def archive_stream(root, fmt='zip', level=6, exclude=()):
+    """Gera o conteúdo de um zip/tar(.gz) de ``root`` em blocos, com memória constante.
+
+    O arquivo é montado numa thread separada que escreve numa fila
+    limitada; este gerador consome a fila. Se o consumidor parar (gerador
+    fechado), a thread é cancelada na próxima escrita.
+    """
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f'Formato de arquivo não suportado: {fmt}')
+    level = max(0, min(int(level), 9))
+
+    chunks = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+    cancelled = threading.Event()
+    done = object()
+    errors = []
+
+    def produce():
+        writer = _QueueWriter(chunks, cancelled)
+        try:
+            if fmt == 'zip':
+                _write_zip(writer, root, level, exclude)
+            else:
+                _write_tar(writer, root, level, exclude, compressed=fmt == 'tar.gz')
+            writer.flush()
+        except ArchiveCancelled:
+            return
+        except Exception as e:
+            errors.append(e)
+        # Sinaliza o fim (a menos que o consumidor já tenha desistido)
+        while not cancelled.is_set():
+            try:
+                chunks.put(done, timeout=ARCHIVE_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            block = chunks.get()
+            if block is done:
+                break
+            yield block
+        if errors:
+            raise errors[0]
+    finally:
+        cancelled.set()
+
+def archive_name(root, fmt):
+    """Nome sugerido para o arquivo gerado a partir de ``root``"""
+    return os.path.basename(os.path.normpath(root)) + ARCHIVE_FORMATS[fmt]
@@ -0,0 +1,190 @@
+import os
+import copy
+import json
+import hashlib
+import threading
+import time
+from src.routes.files import atomic_write, check_base_hash, write_lock, WriteConflict
+
+# Instância do SocketIO usada para avisar os clientes (definida em register_socket_events)
+socketio = None
+
+CONFIG_ROOM = 'bot_config'
+CONFIG_WATCH_INTERVAL = 1.0   # segundos entre verificações de mtime/tamanho enquanto houver inscritos
+
+# Campos conhecidos do config.json do Nazuna; chaves extras são preservadas sem validação
+CONFIG_SCHEMA = {
+    'nomebot': {'type': str, 'required': True, 'max_length': 64},
+    'prefixo': {'type': str, 'required': True, 'min_length': 1, 'max_length': 5},
+    'nomedono': {'type': str, 'required': True, 'max_length': 64},
+    'numerodono': {'type': str, 'required': True, 'pattern': 'digits', 'min_length': 8, 'max_length': 15},
+    'aviso': {'type': bool},
+    'debug': {'type': bool},
+    'lidowner': {'type': str}
+}
+
+class ConfigValidationError(Exception):
+    """A configuração não respeita o ``CONFIG_SCHEMA``"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+def validate_config(config, schema=CONFIG_SCHEMA):
+    """Lista de erros do ``config`` em relação ao ``schema`` (vazia se for válido)"""
+    if not isinstance(config, dict):
+        return ['A configuração deve ser um objeto JSON']
+
+    errors = []
+    for key, rules in schema.items():
+        if key not in config:
+            if rules.get('required'):
+                errors.append(f'{key}: campo obrigatório')
+            continue
+        value = config[key]
+        expected = rules['type']
+        # bool é subclasse de int: não aceitar True onde se espera número e vice-versa
+        if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+            errors.append(f'{key}: deve ser do tipo {expected.__name__}')
+            continue
+        if isinstance(value, str):
+            if len(value) < rules.get('min_length', 0):
+                errors.append(f"{key}: mínimo de {rules['min_length']} caractere(s)")
+            if 'max_length' in rules and len(value) > rules['max_length']:
+                errors.append(f"{key}: máximo de {rules['max_length']} caracteres")
+            if rules.get('pattern') == 'digits' and value and not value.isdigit():
+                errors.append(f'{key}: use apenas dígitos')
+    return errors
+
+def merge_patch(target, patch):
+    """Aplica um JSON Merge Patch (RFC 7386): ``null`` remove a chave, objetos são mesclados"""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+class ConfigStore:
+    """Cópia em memória do config.json do bot.
+
+    A leitura só reabre o arquivo quando inode, mtime ou tamanho mudam, de
+    modo que as consultas frequentes da página de configurações custam um
+    ``stat``. Escritas (completas ou parciais) passam pela validação, pela
+    trava de escrita e pela verificação de hash de ``files.py``. Enquanto
+    houver clientes inscritos, uma thread confere o arquivo a cada
+    ``CONFIG_WATCH_INTERVAL`` e avisa a sala ``bot_config`` quando ele
+    muda no disco (por edição manual, pelo próprio bot, etc.).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.key = None
+        self.cached = None
+        self.subscribers = set()
+        self.thread = None
+        self.notified_hash = None
+
+    def _load(self):
+        """``{'config', 'hash', 'modified'}``, relendo o arquivo só se ele mudou"""
+        stat = os.stat(self.path)
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key == self.key:
+                return self.cached
+
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        cached = {
+            'config': json.loads(raw.decode('utf-8')),
+            'hash': hashlib.sha256(raw).hexdigest(),
+            'modified': stat.st_mtime
+        }
+        with self.lock:
+            self.key = key
+            self.cached = cached
+        return cached
+
+    def get(self):
+        """Configuração atual (não modificar o dicionário devolvido)"""
+        return self._load()
+
+    def _commit(self, config, source):
+        """Valida e grava ``config``; chamado com a trava de escrita do arquivo"""
+        errors = validate_config(config)
+        if errors:
+            raise ConfigValidationError(errors)
+
+        content = json.dumps(config, indent=2, ensure_ascii=False).encode('utf-8')
+        new_hash = atomic_write(self.path, [content])
+
+        stat = os.stat(self.path)
+        cached = {'config': config, 'hash': new_hash, 'modified': stat.st_mtime}
+        with self.lock:
+            self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.cached = cached
+            self.notified_hash = new_hash
+        self._notify(cached, source)
+        return cached
+
+    def replace(self, config, base_hash=None):
+        """Substitui a configuração inteira"""
+        with write_lock(self.path):
+            check_base_hash(self.path, base_hash)
+            return self._commit(config, 'replace')
+
+    def patch(self, changes, base_hash=None):
+        """Altera apenas as chaves de ``changes`` (JSON Merge Patch)"""
+        if not isinstance(changes, dict):
+            raise ConfigValidationError(['O patch deve ser um objeto JSON'])
+        with write_lock(self.path):
+            current = self.get()
+            if base_hash is not None and base_hash != current['hash']:
+                raise WriteConflict(current['hash'])
+            return self._commit(merge_patch(current['config'], changes), 'patch')
+
+    def _notify(self, cached, source):
+        if socketio is not None:
+            socketio.emit('bot_config_changed', {
+                'config': cached['config'],
+                'hash': cached['hash'],
+                'modified': cached['modified'],
+                'source': source,
+                'timestamp': time.time()
+            }, to=CONFIG_ROOM)
+
+    def subscribe(self, sid):
+        with self.lock:
+            self.subscribers.add(sid)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+    def unsubscribe(self, sid):
+        with self.lock:
+            self.subscribers.discard(sid)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+            try:
+                cached = self._load()
+                # O hash avisado é a referência (um GET pode ter relido o arquivo antes)
+                if self.notified_hash is None:
+                    self.notified_hash = cached['hash']
+                elif cached['hash'] != self.notified_hash:
+                    self.notified_hash = cached['hash']
+                    self._notify(cached, 'disk')
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Erro ao verificar config.json: {e}")
+            time.sleep(CONFIG_WATCH_INTERVAL)
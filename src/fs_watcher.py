@@ -0,0 +1,446 @@
+import os
+import ctypes
+import ctypes.util
+import selectors
+import struct
+import threading
+import time
+from src.routes.files import BASE_DIR, is_safe_path, listing_cache
+
+# Instância do SocketIO usada para enviar os eventos (definida em register_socket_events)
+socketio = None
+
+WATCH_DEBOUNCE = 0.2          # segundos sem novos eventos antes de enviar o lote
+WATCH_MAX_DELAY = 1.0         # um diretório muito ativo ainda recebe lotes neste intervalo
+WATCH_POLL_INTERVAL = 2.0     # intervalo do modo de varredura (sem inotify)
+WATCH_MAX_PER_CLIENT = 16
+WATCH_MAX_EVENTS = 500        # acima disso o lote vira um único evento 'rescan'
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+def watch_room(rel_path):
+    return f'dir:{rel_path}'
+
+class Inotify:
+    """Acesso mínimo ao inotify do Linux via ctypes"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 falhou')
+
+    def add(self, path):
+        wd = self._add(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def remove(self, wd):
+        self._rm(self.fd, wd)
+
+    def read(self):
+        """Eventos pendentes como ``(wd, mask, cookie, nome)``"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+class DirectoryWatcher:
+    """Observa os diretórios que os clientes têm abertos no gerenciador de arquivos.
+
+    Cada diretório é observado (inotify, não recursivo) enquanto houver ao
+    menos um cliente nele. Os eventos são agrupados por diretório, as
+    sequências redundantes são fundidas (criar+alterar = criar,
+    criar+apagar = nada) e, após ``WATCH_DEBOUNCE`` segundos de silêncio,
+    o lote vai para a sala ``dir:<caminho>`` com os dados de cada entrada,
+    e a listagem em cache é atualizada com as mesmas mudanças. Sem inotify
+    (outro SO, limite de watches esgotado) os diretórios são varridos
+    periodicamente e comparados com a varredura anterior.
+
+    A thread só existe enquanto algum diretório é observado: ela termina
+    sozinha quando o último cliente sai e volta no próximo ``watch``.
+    """
+
+    def __init__(self, root=BASE_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.clients = {}        # sid -> conjunto de caminhos relativos
+        self.watched = {}        # caminho relativo -> {'refs', 'wd', 'snapshot'}
+        self.by_wd = {}
+        self.pending = {}        # caminho relativo -> {'first', 'last', 'events': {nome: evento}}
+        self.moves = {}          # cookie -> (caminho relativo, nome, is_dir, horário)
+        self.thread = None
+        self.stop_event = None   # sinal de parada da thread atual
+        self.inotify = None
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            print(f"inotify indisponível, usando varredura periódica: {e}")
+
+    def _full_path(self, rel_path):
+        return os.path.normpath(os.path.join(self.root, rel_path))
+
+    def watch(self, sid, rel_path):
+        """Inscreve ``sid`` no diretório; retorna o caminho normalizado"""
+        rel_path = rel_path.strip('/')
+        full_path = self._full_path(rel_path)
+        if not is_safe_path(full_path) or not os.path.isdir(full_path):
+            raise ValueError('Diretório não encontrado')
+        rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+        if rel_path == '.':
+            rel_path = ''
+
+        with self.lock:
+            paths = self.clients.setdefault(sid, set())
+            if rel_path in paths:
+                return rel_path
+            if len(paths) >= WATCH_MAX_PER_CLIENT:
+                raise ValueError('Limite de diretórios observados atingido')
+            paths.add(rel_path)
+
+            entry = self.watched.get(rel_path)
+            if entry is None:
+                entry = {'refs': 0, 'wd': None, 'snapshot': None}
+                self.watched[rel_path] = entry
+                self._start_watch(rel_path, entry)
+            entry['refs'] += 1
+        self._ensure_thread()
+        return rel_path
+
+    def unwatch(self, sid, rel_path):
+        rel_path = rel_path.strip('/')
+        with self.lock:
+            paths = self.clients.get(sid)
+            if not paths or rel_path not in paths:
+                return
+            paths.discard(rel_path)
+            if not paths:
+                del self.clients[sid]
+            self._release(rel_path)
+
+    def unwatch_all(self, sid):
+        """Remove todas as inscrições do cliente (desconexão)"""
+        with self.lock:
+            for rel_path in self.clients.pop(sid, ()):
+                self._release(rel_path)
+
+    def _start_watch(self, rel_path, entry):
+        if self.inotify is not None:
+            try:
+                entry['wd'] = self.inotify.add(self._full_path(rel_path))
+                self.by_wd[entry['wd']] = rel_path
+                return
+            except OSError as e:
+                print(f"Erro ao observar {rel_path or '/'} com inotify, usando varredura: {e}")
+        entry['snapshot'] = self._scan(rel_path)
+
+    def _release(self, rel_path):
+        entry = self.watched.get(rel_path)
+        if entry is None:
+            return
+        entry['refs'] -= 1
+        if entry['refs'] > 0:
+            return
+        del self.watched[rel_path]
+        self.pending.pop(rel_path, None)
+        if entry['wd'] is not None:
+            self.by_wd.pop(entry['wd'], None)
+            self.inotify.remove(entry['wd'])
+
+    def _ensure_thread(self):
+        with self.lock:
+            if self.thread is not None or not self.watched:
+                return
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(self.stop_event,))
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, timeout=None):
+        """Encerra a thread; as inscrições continuam e o próximo ``watch`` a reinicia"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+            if self.stop_event is not None:
+                self.stop_event.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _record(self, rel_path, name, kind, is_dir, old_name=None):
+        """Funde o evento com o que já está pendente para o mesmo nome"""
+        if name.startswith('.'):
+            return
+        now = time.monotonic()
+        batch = self.pending.setdefault(rel_path, {'first': now, 'last': now, 'events': {}})
+        batch['last'] = now
+        events = batch['events']
+        previous = events.get(name)
+
+        if previous is None:
+            event = {'type': kind, 'name': name, 'is_dir': is_dir}
+        elif previous['type'] == 'create' and kind == 'delete':
+            del events[name]
+            return
+        elif previous['type'] in ('create', 'move') and kind == 'modify':
+            return
+        elif previous['type'] == 'move' and kind == 'delete':
+            # Renomeado e depois apagado: para o cliente, só o nome antigo sumiu
+            del events[name]
+            old = previous['old_name']
+            events[old] = {'type': 'delete', 'name': old, 'is_dir': is_dir}
+            return
+        elif previous['type'] == 'delete' and kind == 'create':
+            event = {'type': 'modify', 'name': name, 'is_dir': is_dir}
+        else:
+            event = {'type': kind, 'name': name, 'is_dir': is_dir}
+        if old_name is not None:
+            event['old_name'] = old_name
+        events[name] = event
+
+    def _handle_inotify(self):
+        now = time.monotonic()
+        with self.lock:
+            for wd, mask, cookie, name in self.inotify.read():
+                if mask & IN_Q_OVERFLOW:
+                    # Eventos perdidos: manda todos os diretórios relistarem
+                    for rel_path in self.watched:
+                        self._record_rescan(rel_path)
+                    continue
+                rel_path = self.by_wd.get(wd)
+                if rel_path is None:
+                    continue
+                is_dir = bool(mask & IN_ISDIR)
+
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    # O próprio diretório sumiu; se voltar, a varredura periódica percebe
+                    if mask & IN_IGNORED:
+                        self.by_wd.pop(wd, None)
+                        entry = self.watched.get(rel_path)
+                        if entry is not None and entry['wd'] == wd:
+                            entry['wd'] = None
+                    self._record_rescan(rel_path, gone=True)
+                elif mask & IN_CREATE:
+                    self._record(rel_path, name, 'create', is_dir)
+                elif mask & IN_DELETE:
+                    self._record(rel_path, name, 'delete', is_dir)
+                elif mask & (IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB):
+                    self._record(rel_path, name, 'modify', is_dir)
+                elif mask & IN_MOVED_FROM:
+                    self.moves[cookie] = (rel_path, name, is_dir, now)
+                elif mask & IN_MOVED_TO:
+                    source = self.moves.pop(cookie, None)
+                    if source is None:
+                        self._record(rel_path, name, 'create', is_dir)
+                    elif source[1].startswith('.'):
+                        # Gravação atômica (temporário oculto renomeado sobre o destino)
+                        self._record(rel_path, name, 'modify', is_dir)
+                    elif name.startswith('.'):
+                        self._record(source[0], source[1], 'delete', is_dir)
+                    elif source[0] == rel_path:
+                        self._record(rel_path, name, 'move', is_dir, old_name=source[1])
+                    else:
+                        self._record(source[0], source[1], 'delete', is_dir)
+                        self._record(rel_path, name, 'create', is_dir)
+
+            # MOVED_FROM sem par: o item saiu dos diretórios observados
+            for cookie, (rel_path, name, is_dir, when) in list(self.moves.items()):
+                if now - when > WATCH_DEBOUNCE:
+                    del self.moves[cookie]
+                    if rel_path in self.watched:
+                        self._record(rel_path, name, 'delete', is_dir)
+
+    def _record_rescan(self, rel_path, gone=False):
+        now = time.monotonic()
+        batch = self.pending.setdefault(rel_path, {'first': now, 'last': now, 'events': {}})
+        batch['rescan'] = 'gone' if gone else True
+
+    def _scan(self, rel_path):
+        snapshot = {}
+        try:
+            with os.scandir(self._full_path(rel_path)) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                        snapshot[entry.name] = (entry.is_dir(), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        return snapshot
+
+    def _poll(self):
+        """Modo sem inotify: compara cada diretório com a varredura anterior"""
+        with self.lock:
+            targets = [(rel_path, entry) for rel_path, entry in self.watched.items() if entry['wd'] is None]
+
+        for rel_path, entry in targets:
+            current = self._scan(rel_path)
+            with self.lock:
+                if self.watched.get(rel_path) is not entry:
+                    continue
+                previous, entry['snapshot'] = entry['snapshot'], current
+                if current is None:
+                    if previous is not None:
+                        self._record_rescan(rel_path, gone=True)
+                    continue
+                previous = previous or {}
+
+                removed = {name: info for name, info in previous.items() if name not in current}
+                by_inode = {info[1]: name for name, info in removed.items()}
+                for name, info in current.items():
+                    old = previous.get(name)
+                    if old is None:
+                        old_name = by_inode.pop(info[1], None)
+                        if old_name is not None:
+                            del removed[old_name]
+                            self._record(rel_path, name, 'move', info[0], old_name=old_name)
+                        else:
+                            self._record(rel_path, name, 'create', info[0])
+                    elif old != info:
+                        self._record(rel_path, name, 'modify', info[0])
+                for name, info in removed.items():
+                    self._record(rel_path, name, 'delete', info[0])
+
+    def _describe(self, full_dir, event):
+        """Completa o evento com os mesmos campos da listagem"""
+        if event['type'] == 'delete':
+            return None
+        try:
+            stat = os.stat(os.path.join(full_dir, event['name']))
+        except OSError:
+            event['type'] = 'delete'
+            return None
+        item = {
+            'name': event['name'],
+            'type': 'directory' if os.path.isdir(os.path.join(full_dir, event['name'])) else 'file',
+            'size': stat.st_size,
+            'modified': stat.st_mtime
+        }
+        event['item'] = item
+        return item
+
+    def _flush(self, now):
+        """Envia os lotes cujo intervalo de debounce terminou; retorna o próximo prazo"""
+        due = []
+        next_deadline = None
+        with self.lock:
+            for rel_path, batch in list(self.pending.items()):
+                deadline = min(batch['last'] + WATCH_DEBOUNCE, batch['first'] + WATCH_MAX_DELAY)
+                if deadline <= now:
+                    due.append((rel_path, self.pending.pop(rel_path)))
+                elif next_deadline is None or deadline < next_deadline:
+                    next_deadline = deadline
+            if self.moves:
+                deadline = min(when for _, _, _, when in self.moves.values()) + WATCH_DEBOUNCE
+                next_deadline = deadline if next_deadline is None else min(next_deadline, deadline)
+
+        for rel_path, batch in due:
+            full_dir = self._full_path(rel_path)
+            payload = {'path': rel_path, 'timestamp': time.time()}
+
+            if batch.get('rescan') or len(batch['events']) > WATCH_MAX_EVENTS:
+                listing_cache.invalidate(full_dir)
+                payload['rescan'] = True
+                payload['gone'] = batch.get('rescan') == 'gone'
+                payload['events'] = []
+            else:
+                changes = {}
+                events = []
+                for event in batch['events'].values():
+                    changes[event['name']] = self._describe(full_dir, event)
+                    if event.get('old_name'):
+                        changes[event['old_name']] = None
+                    events.append(event)
+                if not events:
+                    continue
+                listing_cache.apply(full_dir, changes)
+                payload['events'] = events
+
+            if socketio is not None:
+                socketio.emit('fs_events', payload, to=watch_room(rel_path))
+        return next_deadline
+
+    def _idle(self, stop_event):
+        """Libera a thread se não houver mais diretórios observados (ou se ``stop`` foi chamado)"""
+        with self.lock:
+            if stop_event.is_set():
+                return True
+            if self.watched or self.pending:
+                return False
+            self.thread = None
+            stop_event.set()
+            return True
+
+    def _run(self, stop_event):
+        selector = selectors.DefaultSelector()
+        if self.inotify is not None:
+            selector.register(self.inotify.fd, selectors.EVENT_READ)
+        next_poll = time.monotonic()
+
+        try:
+            while not self._idle(stop_event):
+                try:
+                    now = time.monotonic()
+                    if now >= next_poll:
+                        self._poll()
+                        next_poll = now + WATCH_POLL_INTERVAL
+
+                    next_deadline = self._flush(time.monotonic())
+                    timeout = next_poll - time.monotonic()
+                    if next_deadline is not None:
+                        timeout = min(timeout, next_deadline - time.monotonic())
+
+                    if self.inotify is None:
+                        stop_event.wait(max(0, timeout))
+                    elif selector.select(timeout=max(0, timeout)):
+                        self._handle_inotify()
+                except Exception as e:
+                    print(f"Erro no observador de arquivos: {e}")
+                    stop_event.wait(1)
+        finally:
+            selector.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'backend': 'inotify' if self.inotify is not None else 'polling',
+                'directories': len(self.watched),
+                'clients': len(self.clients)
+            }
+
+# Observador compartilhado (um único inotify e uma única thread)
+directory_watcher = DirectoryWatcher()
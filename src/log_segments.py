@@ -0,0 +1,471 @@
+import os
+import json
+import gzip
+import zlib
+import fcntl
+import threading
+import time
+from src.routes.files import atomic_write
+
+# Limites dos segmentos de log em disco
+LOG_SEGMENT_BYTES = int(os.environ.get('BOT_LOG_SEGMENT_BYTES', 8 * 1024 * 1024))
+LOG_SEGMENT_SECONDS = float(os.environ.get('BOT_LOG_SEGMENT_SECONDS', 24 * 3600))
+LOG_RETENTION_BYTES = int(os.environ.get('BOT_LOG_RETENTION_BYTES', 256 * 1024 * 1024))
+LOG_BLOCK_BYTES = 64 * 1024     # granularidade do índice (e de cada membro gzip)
+LOG_COMPRESS_LEVEL = 6
+LOG_FLUSH_INTERVAL = 1.0        # segundos máximos de saída só no buffer do processo
+LOG_WRITER_RETRY = 5.0          # segundos entre tentativas de assumir a escrita
+
+def split_lines(data):
+    """Linhas de ``data`` (com o ``\n``); só ``\n`` separa entradas, ao contrário de ``splitlines``"""
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start) + 1 or len(data)
+        yield data[start:end]
+        start = end
+
+def format_entry(entry):
+    message = entry['message'].replace('\n', ' ')
+    return f"{entry['time']:.3f}\t{entry['level']}\t{message}\n".encode('utf-8', errors='replace')
+
+def parse_line(line):
+    """Linha gravada -> entrada no formato do buffer de logs (sem ``seq``)"""
+    try:
+        stamp, level, message = line.decode('utf-8', errors='replace').rstrip('\n').split('\t', 2)
+        moment = float(stamp)
+    except ValueError:
+        return None
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(moment)),
+        'time': moment,
+        'level': level,
+        'message': message
+    }
+
+def line_time(line):
+    try:
+        return float(line.split(b'\t', 1)[0])
+    except ValueError:
+        return None
+
+class LogSegmentStore:
+    """Histórico dos logs do bot em segmentos rotacionados em disco.
+
+    O segmento ativo (``bot-<ms>.log``) recebe uma linha por entrada
+    (``tempo<TAB>nível<TAB>mensagem``) e é fechado ao passar de
+    ``LOG_SEGMENT_BYTES`` ou ``LOG_SEGMENT_SECONDS``. Segmentos fechados são
+    comprimidos em segundo plano como uma sequência de membros gzip de
+    ~``LOG_BLOCK_BYTES`` (o arquivo continua legível com ``zcat``) e ganham
+    um ``.idx`` com o intervalo de tempo e os offsets de cada bloco; uma
+    consulta por período descomprime só os blocos que se sobrepõem a ele.
+    Os segmentos mais antigos são apagados quando o total passa de
+    ``LOG_RETENTION_BYTES``.
+
+    Com vários processos do painel, só o que obtém o ``flock`` de
+    ``.writer.lock`` grava; os demais apenas consultam. A escrita só é
+    disputada enquanto o processo acompanha um bot (``begin``/``end``) e é
+    solta quando o acompanhamento termina, então o processo que segue a
+    execução seguinte do bot pode assumi-la.
+    """
+
+    def __init__(self, root, segment_bytes=LOG_SEGMENT_BYTES, segment_seconds=LOG_SEGMENT_SECONDS,
+                 retention_bytes=LOG_RETENTION_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_bytes = retention_bytes
+        self.lock = threading.Lock()
+        self.writer_file = None
+        self.writer_checked = 0
+        self.following = 0         # threads deste processo acompanhando o bot
+        self.file = None           # segmento ativo (aberto só pelo processo que grava)
+        self.active_id = None
+        self.opened_at = 0
+        self.size = 0
+        self.blocks = []           # [início, fim, offset] do segmento ativo
+        self.last_flush = 0
+        self.unflushed = False     # há linhas só no buffer do arquivo ativo
+        self.flusher = None
+        self.pending = []          # segmentos fechados aguardando compressão
+        self.thread = None
+        self.index_cache = {}
+
+    def _path(self, segment_id, suffix):
+        return os.path.join(self.root, f'bot-{segment_id}{suffix}')
+
+    def _ensure_writer(self, now):
+        """Tenta assumir a escrita (não bloqueia); chamar com ``lock``"""
+        if self.following == 0:
+            return False
+        if self.writer_file is not None:
+            return True
+        if now - self.writer_checked < LOG_WRITER_RETRY:
+            return False
+        self.writer_checked = now
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, '.writer.lock'), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.writer_file = lock_file
+        # Segmentos que o escritor anterior deixou abertos
+        for segment_id, files in self._list().items():
+            if '.log' in files:
+                self.pending.append(segment_id)
+        self._start_compressor()
+        if self.flusher is None:
+            self.flusher = threading.Thread(target=self._flush_periodically)
+            self.flusher.daemon = True
+            self.flusher.start()
+        return True
+
+    def begin(self):
+        """Uma thread passa a acompanhar o bot: este processo pode disputar a escrita"""
+        with self.lock:
+            self.following += 1
+            self.writer_checked = 0
+
+    def end(self):
+        """Fim de um acompanhamento; sem nenhum, fecha o segmento ativo e solta a escrita"""
+        with self.lock:
+            self.following -= 1
+            if self.following > 0 or self.file is None:
+                self._release_writer()
+                return
+            try:
+                self.file.close()
+            except OSError as e:
+                print(f"Erro ao gravar o log do bot em disco: {e}")
+            self.pending.append(self.active_id)
+            self.file = None
+            self.active_id = None
+            self.unflushed = False
+            self._start_compressor()
+            self._release_writer()
+
+    def _release_writer(self):
+        """Solta o ``flock`` se ninguém acompanha o bot e a compressão terminou; chamar com ``lock``"""
+        if self.writer_file is None or self.following > 0 or self.thread is not None:
+            return
+        self.writer_file.close()
+        self.writer_file = None
+
+    def append(self, entry):
+        """Grava uma entrada do buffer de logs (ignorada se outro processo for o escritor)"""
+        line = format_entry(entry)
+        now = entry['time']
+        with self.lock:
+            try:
+                if not self._ensure_writer(time.time()):
+                    return
+                if (self.file is None or self.size >= self.segment_bytes
+                        or now - self.opened_at >= self.segment_seconds):
+                    self._rotate(now)
+
+                block = self.blocks[-1] if self.blocks else None
+                if block is None or self.size - block[2] >= LOG_BLOCK_BYTES:
+                    self.blocks.append([now, now, self.size])
+                else:
+                    block[0] = min(block[0], now)
+                    block[1] = max(block[1], now)
+                self.file.write(line)
+                self.size += len(line)
+
+                if time.time() - self.last_flush >= LOG_FLUSH_INTERVAL:
+                    self.file.flush()
+                    self.last_flush = time.time()
+                    self.unflushed = False
+                else:
+                    self.unflushed = True
+            except OSError as e:
+                print(f"Erro ao gravar o log do bot em disco: {e}")
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                self.last_flush = time.time()
+                self.unflushed = False
+
+    def _flush_periodically(self):
+        """Grava o que ficou no buffer quando o bot para de escrever (só no processo escritor)"""
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            with self.lock:
+                if not self.unflushed or self.file is None:
+                    continue
+                try:
+                    self.file.flush()
+                except OSError as e:
+                    print(f"Erro ao gravar o log do bot em disco: {e}")
+                self.last_flush = time.time()
+                self.unflushed = False
+
+    def _rotate(self, now):
+        """Fecha o segmento ativo (enfileirando a compressão) e abre outro"""
+        if self.file is not None:
+            self.file.close()
+            self.pending.append(self.active_id)
+            self._start_compressor()
+
+        segment_id = max(int(now * 1000), (self.active_id or 0) + 1)
+        os.makedirs(self.root, exist_ok=True)
+        self.file = open(self._path(segment_id, '.log'), 'ab')
+        self.active_id = segment_id
+        self.opened_at = now
+        self.size = 0
+        self.blocks = []
+        self.last_flush = time.time()
+        self.unflushed = False
+
+    def _start_compressor(self):
+        if self.thread is None and self.pending:
+            self.thread = threading.Thread(target=self._compress_pending)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _compress_pending(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    break
+                segment_id = self.pending.pop(0)
+            try:
+                self._compress(segment_id)
+            except Exception as e:
+                print(f"Erro ao comprimir o segmento de log {segment_id}: {e}")
+        try:
+            self._enforce_retention()
+        except Exception as e:
+            print(f"Erro ao aplicar a retenção dos logs do bot: {e}")
+        with self.lock:
+            self.thread = None
+            if self.pending:
+                self._start_compressor()
+            else:
+                self._release_writer()
+
+    def _compress(self, segment_id):
+        """``bot-<id>.log`` -> ``bot-<id>.log.gz`` (um membro gzip por bloco) + ``bot-<id>.idx``"""
+        source = self._path(segment_id, '.log')
+        if os.path.exists(self._path(segment_id, '.idx')):
+            # Compressão concluída antes de uma queda; falta só apagar o original
+            os.remove(source)
+            return
+
+        blocks = []
+        lines = 0
+
+        def members(f):
+            nonlocal lines
+            offset = compressed = 0
+            while True:
+                data = f.read(LOG_BLOCK_BYTES)
+                if not data:
+                    return
+                data += f.readline()  # o bloco termina no fim de uma linha
+                times = [t for t in map(line_time, split_lines(data)) if t is not None]
+                member = gzip.compress(data, compresslevel=LOG_COMPRESS_LEVEL, mtime=0)
+                if times:
+                    blocks.append([min(times), max(times), offset, compressed])
+                lines += len(times)
+                offset += len(data)
+                compressed += len(member)
+                yield member
+                time.sleep(0)  # no modo gevent, dá vez às outras greenlets entre blocos
+
+        with open(source, 'rb') as f:
+            atomic_write(self._path(segment_id, '.log.gz'), members(f))
+            size = f.tell()
+
+        if not blocks:
+            os.remove(self._path(segment_id, '.log.gz'))
+            os.remove(source)
+            return
+
+        index = {
+            'start': min(block[0] for block in blocks),
+            'end': max(block[1] for block in blocks),
+            'lines': lines,
+            'size': size,
+            'blocks': blocks
+        }
+        atomic_write(self._path(segment_id, '.idx'), [json.dumps(index).encode('utf-8')])
+        os.remove(source)
+
+    def _list(self):
+        """``{id: {sufixos}}`` dos arquivos de segmento na pasta"""
+        segments = {}
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return segments
+        for name in names:
+            if not name.startswith('bot-'):
+                continue
+            for suffix in ('.log.gz', '.log', '.idx'):
+                if name.endswith(suffix):
+                    try:
+                        segment_id = int(name[4:-len(suffix)])
+                    except ValueError:
+                        break
+                    segments.setdefault(segment_id, set()).add(suffix)
+                    break
+        return dict(sorted(segments.items()))
+
+    def _enforce_retention(self):
+        """Apaga os segmentos fechados mais antigos até o total caber em ``retention_bytes``"""
+        segments = self._list()
+        sizes = {}
+        for segment_id, files in segments.items():
+            total = 0
+            for suffix in files:
+                try:
+                    total += os.path.getsize(self._path(segment_id, suffix))
+                except OSError:
+                    pass
+            sizes[segment_id] = total
+
+        total = sum(sizes.values())
+        for segment_id, files in segments.items():
+            if total <= self.retention_bytes:
+                break
+            if '.idx' not in files or '.log' in files:
+                continue  # ativo ou ainda não comprimido
+            for suffix in files:
+                try:
+                    os.remove(self._path(segment_id, suffix))
+                except FileNotFoundError:
+                    pass
+            self.index_cache.pop(segment_id, None)
+            total -= sizes[segment_id]
+
+    def _load_index(self, segment_id):
+        index = self.index_cache.get(segment_id)
+        if index is None:
+            with open(self._path(segment_id, '.idx'), 'rb') as f:
+                index = json.loads(f.read().decode('utf-8'))
+            self.index_cache[segment_id] = index
+        return index
+
+    def _read_compressed(self, segment_id, index, start, end, min_offset):
+        path = self._path(segment_id, '.log.gz')
+        blocks = index['blocks']
+        with open(path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            for i, (block_start, block_end, offset, compressed) in enumerate(blocks):
+                next_offset = blocks[i + 1][2] if i + 1 < len(blocks) else index['size']
+                if block_end < start or block_start > end or next_offset <= min_offset:
+                    continue
+                next_compressed = blocks[i + 1][3] if i + 1 < len(blocks) else file_size
+                f.seek(compressed)
+                data = zlib.decompressobj(wbits=31).decompress(f.read(next_compressed - compressed))
+                yield from self._lines(data, offset, start, end, min_offset)
+
+    def _read_plain(self, segment_id, blocks, size, start, end, min_offset):
+        """Segmento ainda não comprimido; ``blocks`` (se conhecido) evita ler o arquivo inteiro"""
+        ranges = []
+        if blocks:
+            for i, (block_start, block_end, offset) in enumerate(blocks):
+                next_offset = blocks[i + 1][2] if i + 1 < len(blocks) else size
+                if block_end < start or block_start > end or next_offset <= min_offset:
+                    continue
+                if ranges and ranges[-1][1] == offset:
+                    ranges[-1][1] = next_offset
+                else:
+                    ranges.append([offset, next_offset])
+        else:
+            ranges.append([0, size])
+
+        with open(self._path(segment_id, '.log'), 'rb') as f:
+            for first, last in ranges:
+                # Offsets de cursor sempre caem no início de uma linha
+                position = max(first, min_offset)
+                f.seek(position)
+                while position < last:
+                    data = f.read(min(LOG_BLOCK_BYTES, last - position))
+                    complete = data.rfind(b'\n') + 1
+                    if complete == 0:
+                        break  # fim do arquivo no meio de uma linha ainda sendo escrita
+                    f.seek(position + complete)
+                    yield from self._lines(data[:complete], position, start, end, min_offset)
+                    position += complete
+
+    def _lines(self, data, offset, start, end, min_offset):
+        """``(offset da próxima linha, entrada)`` das linhas de ``data`` dentro do período"""
+        for line in split_lines(data):
+            line_offset = offset
+            offset += len(line)
+            if line_offset < min_offset:
+                continue
+            entry = parse_line(line)
+            if entry is not None and start <= entry['time'] <= end:
+                yield offset, entry
+
+    def query(self, start=None, end=None, limit=200, cursor=None):
+        """Entradas com ``start <= tempo <= end`` em ordem de gravação.
+
+        Retorna ``(entradas, próximo_cursor)``; o cursor (``"<segmento>:<offset>"``)
+        continua a leitura de onde a página parou e é ``None`` no fim.
+        """
+        start = start if start is not None else float('-inf')
+        end = end if end is not None else float('inf')
+        cursor_id, cursor_offset = None, 0
+        if cursor:
+            cursor_id, cursor_offset = (int(part) for part in cursor.split(':', 1))
+
+        self.flush()
+        with self.lock:
+            active = (self.active_id, list(map(list, self.blocks)), self.size) if self.file is not None else None
+
+        results = []
+        for segment_id, files in self._list().items():
+            if cursor_id is not None and segment_id < cursor_id:
+                continue
+            if segment_id / 1000 > end:
+                break  # segmentos seguintes começaram depois do período
+            min_offset = cursor_offset if segment_id == cursor_id else 0
+
+            try:
+                if '.idx' in files and '.log.gz' in files:
+                    index = self._load_index(segment_id)
+                    if index['end'] < start:
+                        continue
+                    lines = self._read_compressed(segment_id, index, start, end, min_offset)
+                elif '.log' in files:
+                    if active is not None and active[0] == segment_id:
+                        blocks, size = active[1], active[2]
+                    else:
+                        # Segmento aberto por outro processo: sem índice em memória
+                        blocks, size = None, os.path.getsize(self._path(segment_id, '.log'))
+                    lines = self._read_plain(segment_id, blocks, size, start, end, min_offset)
+                else:
+                    continue
+
+                for next_offset, entry in lines:
+                    results.append(entry)
+                    if len(results) >= limit:
+                        return results, f'{segment_id}:{next_offset}'
+            except FileNotFoundError:
+                # Segmento comprimido ou removido pela retenção durante a leitura
+                continue
+
+        return results, None
+
+    def stats(self):
+        segments = self._list()
+        total = 0
+        for segment_id, files in segments.items():
+            for suffix in files:
+                try:
+                    total += os.path.getsize(self._path(segment_id, suffix))
+                except OSError:
+                    pass
+        return {
+            'segments': len(segments),
+            'bytes': total,
+            'retention_bytes': self.retention_bytes,
+            'writer': self.writer_file is not None
+        }
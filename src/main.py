@@ -3,14 +3,30 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+# Modo de execução: 'development' (servidor do Werkzeug com threads, o padrão) ou 'production' (gevent).
+# O monkey patch do gevent precisa acontecer antes de qualquer import que use threads ou sockets.
+# No modo gevent, trabalho de CPU/disco longo (índice de busca, hashes, snapshots de backup)
+# ainda roda no hub e atrasa as demais requisições enquanto executa.
+PANEL_MODE = 'production' if '--production' in sys.argv else os.environ.get('PANEL_MODE', 'development')
+if PANEL_MODE == 'production':
+    from gevent import monkey
+    monkey.patch_all()
+
+import argparse
+from flask import Flask, request
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
-from src.routes.bot import bot_bp
+from src.routes.bot import bot_bp, bot_supervisor
 from src.routes.terminal import terminal_bp
+from src.routes.jobs import jobs_bp
 from src.routes.files import files_bp
+from src.routes.system import system_bp
+from src.routes.search import search_bp
+from src.routes.backup import backup_bp, backup_scheduler
+from src.routes.metrics import metrics_bp, instrument_app, instrument_socketio, register_default_gauges
+from src.static_manifest import StaticManifest
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -18,14 +34,28 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 # Configurar CORS para permitir requisições do frontend
 CORS(app, origins="*")
 
-# Configurar SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Configurar SocketIO. Com SOCKETIO_MESSAGE_QUEUE (ex.: redis://redis:6379/0) vários
+# processos do painel compartilham as transmissões para salas e clientes.
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode='gevent' if PANEL_MODE == 'production' else 'threading',
+    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+)
 
 # Registrar blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(bot_bp, url_prefix='/api/bot')
 app.register_blueprint(terminal_bp, url_prefix='/api/terminal')
+app.register_blueprint(jobs_bp, url_prefix='/api/terminal/jobs')
 app.register_blueprint(files_bp, url_prefix='/api/files')
+app.register_blueprint(search_bp, url_prefix='/api/files')
+app.register_blueprint(system_bp, url_prefix='/api/system')
+app.register_blueprint(backup_bp, url_prefix='/api/backups')
+app.register_blueprint(metrics_bp)
+
+# Contagem e latência de cada requisição (exposta em /metrics)
+instrument_app(app)
 
 # Configuração do banco de dados
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -34,26 +64,66 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Manifesto dos arquivos estáticos (tamanho, hash, tipo e variantes .gz/.br)
+static_manifest = StaticManifest(app.static_folder) if app.static_folder else None
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if static_manifest is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
+    if path != "" and static_manifest.get(path):
+        return static_manifest.send(path, request.accept_encodings)
     else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+        if static_manifest.get('index.html'):
+            return static_manifest.send('index.html', request.accept_encodings)
         else:
             return "index.html not found", 404
 
+# Retoma o bot que continuou rodando durante um reinício do painel. No modo de
+# desenvolvimento o processo pai do reloader do Werkzeug só vigia os arquivos:
+# quem atende (e acompanha o bot) é o filho, com WERKZEUG_RUN_MAIN definido
+RELOADER_PARENT = (PANEL_MODE != 'production' and __name__ == '__main__'
+                   and not os.environ.get('WERKZEUG_RUN_MAIN'))
+if not RELOADER_PARENT:
+    bot_supervisor.adopt()
+
+# Snapshots agendados de nazuna/dados (o flock do repositório evita execuções duplicadas)
+backup_scheduler.start()
+
 # Eventos SocketIO
 from src.routes.socket_events import register_socket_events
 register_socket_events(socketio)
+instrument_socketio(socketio)
+register_default_gauges(socketio)
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
+    parser = argparse.ArgumentParser(description='Nazuna Panel')
+    parser.add_argument('--production', action='store_true', help='servidor gevent, sem debug (ou PANEL_MODE=production)')
+    parser.add_argument('--host', default=os.environ.get('PANEL_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PANEL_PORT', 5000)))
+    args = parser.parse_args()
+
+    if PANEL_MODE == 'production':
+        import socket
+        from gevent import pywsgi
+
+        class NoDelayHandler(pywsgi.WSGIHandler):
+            """Desliga o algoritmo de Nagle em cada conexão.
+
+            Com keep-alive, cabeçalhos e corpo saem em escritas separadas e a
+            segunda esperava o ACK atrasado do cliente (~40 ms por resposta).
+            """
+
+            def handle(self):
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                super().handle()
+
+        # Servidor WSGI do gevent: cada requisição/conexão roda em uma greenlet
+        # (o mesmo que socketio.run faz, mas com o handler acima)
+        socketio.wsgi_server = pywsgi.WSGIServer((args.host, args.port), app, handler_class=NoDelayHandler)
+        socketio.wsgi_server.serve_forever()
+    else:
+        socketio.run(app, host=args.host, port=args.port, debug=True, allow_unsafe_werkzeug=True)
 
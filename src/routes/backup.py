@@ -0,0 +1,420 @@
+import os
+import json
+import zlib
+import fcntl
+import hashlib
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import Blueprint, jsonify, request
+from src.routes.files import BASE_DIR, BACKUP_DIR, atomic_write, is_safe_path, write_lock, invalidate_listing
+
+backup_bp = Blueprint('backup', __name__)
+
+# Snapshots incrementais de nazuna/dados num repositório endereçado por conteúdo
+BACKUP_SOURCE = os.path.join(BASE_DIR, 'dados')
+BACKUP_STORE = os.path.join(BACKUP_DIR, 'store')
+BACKUP_INTERVAL = float(os.environ.get('BACKUP_INTERVAL', 3600))   # 0 desativa o agendamento
+BACKUP_CHUNK_SIZE = 1024 * 1024
+BACKUP_COMPRESS_LEVEL = 6
+BACKUP_KEEP_LAST = int(os.environ.get('BACKUP_KEEP_LAST', 24))
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 7))
+
+class BackupBusy(Exception):
+    """Outro snapshot/limpeza está em andamento (possivelmente em outro processo)"""
+
+class BackupStore:
+    """Repositório de snapshots com deduplicação por conteúdo.
+
+    Cada arquivo é dividido em blocos de ``BACKUP_CHUNK_SIZE`` gravados
+    (comprimidos) em ``chunks/xx/<sha256>``; um bloco já existente nunca é
+    gravado de novo. O snapshot é só um manifesto JSON com a lista de
+    blocos de cada arquivo. Arquivos com o mesmo tamanho e mtime do
+    snapshot anterior reaproveitam a lista sem serem lidos, e bancos JSON
+    que só crescem no final reaproveitam todos os blocos menos o último.
+    """
+
+    def __init__(self, root=BACKUP_STORE, source=BACKUP_SOURCE):
+        self.root = root
+        self.source = source
+        self.chunks_dir = os.path.join(root, 'chunks')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def exclusive(self):
+        """Trava o repositório nesta thread e entre processos (flock)"""
+        if not self.lock.acquire(blocking=False):
+            raise BackupBusy()
+        try:
+            os.makedirs(self.chunks_dir, exist_ok=True)
+            os.makedirs(self.snapshots_dir, exist_ok=True)
+            with open(os.path.join(self.root, '.lock'), 'w') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise BackupBusy()
+                yield
+        finally:
+            self.lock.release()
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _put_chunk(self, data):
+        """Grava o bloco se ainda não existir; retorna ``(hash, bytes gravados)``"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, BACKUP_COMPRESS_LEVEL)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return digest, len(compressed)
+
+    def read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'Bloco corrompido: {digest}')
+        return data
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.source):
+            dirnames[:] = sorted(d for d in dirnames if not os.path.islink(os.path.join(dirpath, d)))
+            for filename in sorted(filenames):
+                full_path = os.path.join(dirpath, filename)
+                if os.path.islink(full_path):
+                    continue
+                yield full_path, os.path.relpath(full_path, self.source).replace(os.sep, '/')
+
+    def _load(self, snapshot_id):
+        path = os.path.join(self.snapshots_dir, f'{snapshot_id}.json')
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def snapshots(self):
+        """Manifestos de todos os snapshots (sem a lista de arquivos), do mais antigo ao mais recente"""
+        result = []
+        try:
+            names = sorted(os.listdir(self.snapshots_dir))
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                manifest = self._load(name[:-5])
+            except (OSError, ValueError):
+                continue
+            result.append({k: v for k, v in manifest.items() if k != 'files'})
+        result.sort(key=lambda s: s['created'])
+        return result
+
+    def get(self, snapshot_id):
+        if not snapshot_id.replace('-', '').isalnum():
+            raise FileNotFoundError(snapshot_id)
+        return self._load(snapshot_id)
+
+    def snapshot(self, reason='manual'):
+        """Cria um snapshot de ``source``, gravando só os blocos novos"""
+        with self.exclusive():
+            started = time.time()
+            snapshots = self.snapshots()
+            previous = {}
+            if snapshots:
+                for entry in self._load(snapshots[-1]['id'])['files']:
+                    previous[entry['path']] = entry
+
+            files = []
+            stats = {'files': 0, 'bytes': 0, 'reused_files': 0, 'new_chunks': 0, 'stored_bytes': 0}
+            for full_path, rel_path in self._walk():
+                try:
+                    stat = os.stat(full_path)
+                    old = previous.get(rel_path)
+                    if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+                        chunks = old['chunks']
+                        stats['reused_files'] += 1
+                    else:
+                        chunks = []
+                        with open(full_path, 'rb') as f:
+                            for block in iter(lambda: f.read(BACKUP_CHUNK_SIZE), b''):
+                                digest, written = self._put_chunk(block)
+                                chunks.append(digest)
+                                if written:
+                                    stats['new_chunks'] += 1
+                                    stats['stored_bytes'] += written
+                except OSError as e:
+                    print(f"Erro ao copiar {full_path} para o backup: {e}")
+                    continue
+
+                files.append({
+                    'path': rel_path,
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'mode': stat.st_mode & 0o7777,
+                    'chunks': chunks
+                })
+                stats['files'] += 1
+                stats['bytes'] += stat.st_size
+
+            snapshot_id = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:6]
+            manifest = {
+                'id': snapshot_id,
+                'created': started,
+                'reason': reason,
+                'source': self.source,
+                'elapsed': round(time.time() - started, 3),
+                'stats': stats,
+                'files': files
+            }
+            data = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+            atomic_write(os.path.join(self.snapshots_dir, f'{snapshot_id}.json'), [data])
+            return {k: v for k, v in manifest.items() if k != 'files'}
+
+    def restore(self, snapshot_id, paths=None, target=None):
+        """Restaura arquivos do snapshot (todos ou os de ``paths``) em ``target`` (padrão: ``source``)"""
+        with self.exclusive():
+            return self._restore(self.get(snapshot_id), paths, target or self.source)
+
+    def _restore(self, manifest, paths, target):
+        wanted = None
+        if paths:
+            wanted = [p.strip('/') for p in paths]
+
+        restored = []
+        for entry in manifest['files']:
+            rel_path = entry['path']
+            if wanted is not None and not any(rel_path == p or rel_path.startswith(f'{p}/') for p in wanted):
+                continue
+            full_path = os.path.join(target, rel_path)
+            if not is_safe_path(full_path):
+                continue
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with write_lock(full_path):
+                atomic_write(full_path, (self.read_chunk(digest) for digest in entry['chunks']))
+                os.chmod(full_path, entry['mode'])
+            invalidate_listing(full_path)
+            restored.append(rel_path)
+        return restored
+
+    def prune(self, keep_last=BACKUP_KEEP_LAST, keep_daily=BACKUP_KEEP_DAILY):
+        """Remove snapshots fora da retenção e depois os blocos que ninguém mais usa"""
+        with self.exclusive():
+            snapshots = self.snapshots()
+            keep = {s['id'] for s in snapshots[-keep_last:]} if keep_last > 0 else set()
+
+            # O snapshot mais recente de cada um dos últimos ``keep_daily`` dias
+            days = {}
+            for s in snapshots:
+                days[time.strftime('%Y-%m-%d', time.localtime(s['created']))] = s['id']
+            for day in sorted(days)[-keep_daily:] if keep_daily > 0 else []:
+                keep.add(days[day])
+
+            removed = []
+            for s in snapshots:
+                if s['id'] not in keep:
+                    os.remove(os.path.join(self.snapshots_dir, f"{s['id']}.json"))
+                    removed.append(s['id'])
+
+            # Marca os blocos referenciados e varre o resto
+            referenced = set()
+            for snapshot_id in keep:
+                for entry in self._load(snapshot_id)['files']:
+                    referenced.update(entry['chunks'])
+
+            freed_chunks = freed_bytes = 0
+            for prefix in os.listdir(self.chunks_dir):
+                directory = os.path.join(self.chunks_dir, prefix)
+                for name in os.listdir(directory):
+                    if name in referenced:
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        freed_bytes += os.path.getsize(path)
+                        os.remove(path)
+                        freed_chunks += 1
+                    except OSError:
+                        pass
+
+            return {
+                'removed': removed,
+                'kept': len(keep),
+                'freed_chunks': freed_chunks,
+                'freed_bytes': freed_bytes
+            }
+
+    def usage(self):
+        """Espaço ocupado pelos blocos no disco"""
+        chunks = size = 0
+        for dirpath, _, filenames in os.walk(self.chunks_dir):
+            for name in filenames:
+                try:
+                    size += os.path.getsize(os.path.join(dirpath, name))
+                    chunks += 1
+                except OSError:
+                    pass
+        return {'chunks': chunks, 'bytes': size}
+
+class BackupScheduler:
+    """Thread que tira um snapshot a cada ``interval`` segundos e aplica a retenção"""
+
+    def __init__(self, store, interval=BACKUP_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self.thread = None
+        self.last_run = None
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None or self.interval <= 0:
+                return
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not os.path.isdir(self.store.source):
+                continue
+            try:
+                self.store.snapshot(reason='scheduled')
+                self.store.prune()
+                self.last_error = None
+            except BackupBusy:
+                # Outro processo do painel já está cuidando deste ciclo
+                pass
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Erro no backup agendado: {e}")
+            self.last_run = time.time()
+
+# Repositório e agendador compartilhados
+backup_store = BackupStore()
+backup_scheduler = BackupScheduler(backup_store)
+
+@backup_bp.route('', methods=['GET'])
+def list_backups():
+    """Lista os snapshots e o espaço ocupado pelo repositório"""
+    try:
+        return jsonify({
+            'success': True,
+            'snapshots': backup_store.snapshots(),
+            'usage': backup_store.usage(),
+            'interval': backup_scheduler.interval,
+            'last_run': backup_scheduler.last_run,
+            'last_error': backup_scheduler.last_error
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao listar backups: {str(e)}'
+        }), 500
+
+@backup_bp.route('', methods=['POST'])
+def create_backup():
+    """Tira um snapshot imediatamente"""
+    try:
+        if not os.path.isdir(backup_store.source):
+            return jsonify({
+                'success': False,
+                'message': 'Diretório de dados não encontrado'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'message': 'Snapshot criado com sucesso',
+            'snapshot': backup_store.snapshot()
+        })
+    except BackupBusy:
+        return jsonify({
+            'success': False,
+            'message': 'Já existe um backup em andamento'
+        }), 409
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao criar backup: {str(e)}'
+        }), 500
+
+@backup_bp.route('/<snapshot_id>', methods=['GET'])
+def backup_details(snapshot_id):
+    """Retorna o manifesto de um snapshot (arquivos sem a lista de blocos)"""
+    try:
+        manifest = backup_store.get(snapshot_id)
+        manifest['files'] = [{k: v for k, v in f.items() if k != 'chunks'} for f in manifest['files']]
+        return jsonify({
+            'success': True,
+            'snapshot': manifest
+        })
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'message': 'Snapshot não encontrado'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao ler backup: {str(e)}'
+        }), 500
+
+@backup_bp.route('/<snapshot_id>/restore', methods=['POST'])
+def restore_backup(snapshot_id):
+    """Restaura o snapshot em ``dados/`` (ou só os caminhos em ``paths``)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        restored = backup_store.restore(snapshot_id, paths=data.get('paths'))
+        return jsonify({
+            'success': True,
+            'message': f'{len(restored)} arquivo(s) restaurado(s)',
+            'restored': restored
+        })
+    except BackupBusy:
+        return jsonify({
+            'success': False,
+            'message': 'Já existe um backup em andamento'
+        }), 409
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'message': 'Snapshot não encontrado'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao restaurar backup: {str(e)}'
+        }), 500
+
+@backup_bp.route('/prune', methods=['POST'])
+def prune_backups():
+    """Aplica a retenção (``keep_last``/``keep_daily``) e libera os blocos órfãos"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = backup_store.prune(
+            keep_last=int(data.get('keep_last', BACKUP_KEEP_LAST)),
+            keep_daily=int(data.get('keep_daily', BACKUP_KEEP_DAILY))
+        )
+        return jsonify({
+            'success': True,
+            'message': f"{len(result['removed'])} snapshot(s) removido(s)",
+            **result
+        })
+    except BackupBusy:
+        return jsonify({
+            'success': False,
+            'message': 'Já existe um backup em andamento'
+        }), 409
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao limpar backups: {str(e)}'
+        }), 500
@@ -1,109 +1,580 @@
 import os
+import re
+import json
+import atexit
+import fcntl
 import subprocess
 import signal
-from flask import Blueprint, request, jsonify
+from contextlib import contextmanager
+from flask import Blueprint, Response, request, jsonify
 from flask_socketio import emit
+from src.routes.files import atomic_write, WriteConflict
+from src.config_store import ConfigStore, ConfigValidationError
+from src.log_segments import LogSegmentStore
+import psutil
 import threading
 import time
+from datetime import datetime
 
 bot_bp = Blueprint('bot', __name__)
 
-# Variáveis globais para controle do processo do bot
-bot_process = None
-bot_status = "stopped"
-nazuna_path = "/home/ubuntu/nazuna"
+nazuna_path = os.environ.get('NAZUNA_DIR', "/home/ubuntu/nazuna")
 
-def get_bot_status():
-    """Verifica o status atual do bot"""
-    global bot_process, bot_status
-    
-    if bot_process is None:
-        bot_status = "stopped"
-        return bot_status
-    
-    # Verifica se o processo ainda está rodando
-    try:
-        if bot_process.poll() is None:
-            bot_status = "running"
+# Estado do bot compartilhado entre processos do painel (pastas ``data/`` e ``logs/`` do start.sh)
+PANEL_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BOT_STATE_PATH = os.path.join(PANEL_DIR, 'data', 'bot_state.json')
+BOT_LOCK_PATH = os.path.join(PANEL_DIR, 'data', 'bot.lock')
+BOT_OUTPUT_PATH = os.path.join(PANEL_DIR, 'logs', 'bot-output.log')
+BOT_OUTPUT_LOCK_PATH = os.path.join(PANEL_DIR, 'logs', 'bot-output.lock')
+BOT_LOG_DIR = os.path.join(PANEL_DIR, 'logs', 'bot')   # histórico em segmentos (ver log_segments.py)
+BOT_OUTPUT_MAX_BYTES = 8 * 1024 * 1024   # a saída já lida é descartada acima disso
+BOT_OUTPUT_POLL = 0.1
+BOT_OUTPUT_QUIET = 1.0   # saída parada por esse tempo antes de ser descartada (todos já leram)
+BOT_STOP_TIMEOUT = 5
+BOT_RESTART_DELAY = 2
+
+# Limites do buffer de logs em memória (orçamento fixo, independente do volume)
+LOG_BUFFER_MAX_LINES = 5000
+LOG_BUFFER_MAX_BYTES = 2 * 1024 * 1024
+LOG_MAX_LINE_LENGTH = 4096
+LOG_PAGE_LIMIT = 1000
+
+def guess_log_level(message):
+    """Deduz o nível de uma linha de log a partir do conteúdo"""
+    lowered = message.lower()
+    if 'error' in lowered or 'erro' in lowered or 'exception' in lowered:
+        return 'error'
+    if 'warn' in lowered or 'aviso' in lowered:
+        return 'warning'
+    return 'info'
+
+class LogBuffer:
+    """Buffer circular para a saída do bot com limite de linhas e de bytes.
+
+    Cada linha recebe um número de sequência crescente (``seq``) que serve
+    de cursor para os clientes: ``read(since)`` devolve apenas as linhas
+    posteriores a ``since`` sem copiar o restante do buffer.
+    """
+
+    # Custo aproximado de cada entrada além do texto (dict, floats, etc.)
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_lines=LOG_BUFFER_MAX_LINES, max_bytes=LOG_BUFFER_MAX_BYTES,
+                 max_line_length=LOG_MAX_LINE_LENGTH, sink=None):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.max_line_length = max_line_length
+        self._slots = [None] * max_lines
+        self._sizes = [0] * max_lines
+        self._first = 1  # seq da linha mais antiga ainda retida
+        self._next = 1   # seq que será atribuído à próxima linha
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self.sink = sink  # recebe cada entrada nova (ex.: gravação em disco)
+
+    def _evict_oldest(self):
+        index = self._first % self.max_lines
+        self._bytes -= self._sizes[index]
+        self._slots[index] = None
+        self._sizes[index] = 0
+        self._first += 1
+
+    def append(self, message, level=None):
+        """Adiciona uma linha ao buffer, descartando as mais antigas se necessário"""
+        if len(message) > self.max_line_length:
+            message = message[:self.max_line_length] + '…'
+
+        now = time.time()
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'time': now,
+            'level': level or guess_log_level(message),
+            'message': message
+        }
+        size = len(message) + self.ENTRY_OVERHEAD
+
+        with self._cond:
+            if self._next - self._first >= self.max_lines:
+                self._evict_oldest()
+            while self._first < self._next and self._bytes + size > self.max_bytes:
+                self._evict_oldest()
+
+            entry['seq'] = self._next
+            index = self._next % self.max_lines
+            self._slots[index] = entry
+            self._sizes[index] = size
+            self._bytes += size
+            self._next += 1
+            self._cond.notify_all()
+
+        if self.sink is not None:
+            self.sink(entry)
+        return entry
+
+    def read(self, since=0, limit=200):
+        """Retorna até ``limit`` linhas com seq maior que ``since``.
+
+        Devolve ``(linhas, descartadas)``, onde ``descartadas`` é a quantidade
+        de linhas posteriores a ``since`` que já saíram do buffer.
+        """
+        with self._cond:
+            start = max(since + 1, self._first)
+            end = min(self._next, start + max(limit, 0))
+            entries = [self._slots[seq % self.max_lines] for seq in range(start, end)]
+            dropped = start - (since + 1) if since + 1 < self._first else 0
+            return entries, dropped
+
+    def wait(self, since, timeout=None):
+        """Bloqueia até existir linha com seq maior que ``since`` ou até ``wake()``"""
+        with self._cond:
+            if self._next - 1 > since:
+                return True
+            self._cond.wait(timeout)
+            return self._next - 1 > since
+
+    def wake(self):
+        """Acorda as threads bloqueadas em ``wait()``"""
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def last_seq(self):
+        """Seq da linha mais recente (0 se o buffer nunca recebeu linhas)"""
+        with self._cond:
+            return self._next - 1
+
+    @property
+    def first_seq(self):
+        """Seq da linha mais antiga ainda disponível"""
+        with self._cond:
+            return self._first
+
+    def stats(self):
+        """Uso atual do buffer"""
+        with self._cond:
+            return {
+                'lines': self._next - self._first,
+                'bytes': self._bytes,
+                'max_lines': self.max_lines,
+                'max_bytes': self.max_bytes
+            }
+
+# Histórico persistente dos logs e buffer compartilhado com a saída do processo do bot
+bot_log_store = LogSegmentStore(BOT_LOG_DIR)
+log_buffer = LogBuffer(sink=bot_log_store.append)
+atexit.register(bot_log_store.flush)
+
+# Funções chamadas quando o estado do bot muda (ex.: o broadcaster do SocketIO)
+status_listeners = []
+
+def notify_status_change(**event):
+    """Avisa os listeners de que o estado do bot mudou"""
+    for listener in list(status_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"Erro ao notificar mudança de status do bot: {e}")
+
+class BotBusy(Exception):
+    """A operação pedida não é válida no estado atual do bot"""
+
+class BotSupervisor:
+    """Dono único do processo do bot.
+
+    Toda transição (``stopped`` → ``starting`` → ``running`` → ``stopping``
+    → ``stopped``, ou ``error``) acontece com a trava da instância e um
+    ``flock`` em ``data/bot.lock``, então um ``restart`` não corre contra
+    um ``start`` simultâneo nem entre processos do painel. O estado e o
+    PID ficam em ``data/bot_state.json``, que qualquer processo lê.
+
+    O bot roda em uma sessão própria (o sinal de parada vai para o grupo
+    todo: npm e node) e escreve a saída em ``logs/bot-output.log`` em vez
+    de um pipe. Assim ele sobrevive a um reinício do painel, que o readota
+    na inicialização (confirmando PID e horário de criação) e volta a
+    acompanhar o arquivo de saída.
+    """
+
+    def __init__(self, state_path=BOT_STATE_PATH, lock_path=BOT_LOCK_PATH, output_path=BOT_OUTPUT_PATH,
+                 output_lock_path=BOT_OUTPUT_LOCK_PATH):
+        self.state_path = state_path
+        self.lock_path = lock_path
+        self.output_path = output_path
+        self.output_lock_path = output_lock_path
+        self.rotation_lock = None    # ``flock`` de quem descarta a saída já lida (um processo só)
+        self.lock = threading.RLock()
+        self.popen = None            # subprocess.Popen quando o bot foi iniciado por este processo
+        self.process = None          # psutil.Process do bot atual (iniciado ou readotado)
+        self.generation = 0          # muda a cada processo; threads antigas param sozinhas
+        self.state = {'status': 'stopped', 'pid': None}
+        self._state_mtime = None
+
+    @contextmanager
+    def exclusive(self):
+        """Trava as transições nesta thread e entre processos do painel"""
+        with self.lock:
+            os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+            with open(self.lock_path, 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._refresh(force=True)
+                yield
+
+    def _refresh(self, force=False):
+        """Relê o arquivo de estado se outro processo o alterou"""
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if not force and mtime == self._state_mtime:
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._state_mtime = mtime
+        changed = state.get('pid') != self.state.get('pid')
+        self.state = state
+        if changed:
+            # Bot iniciado por outro processo do painel (ou antes de um reinício): passa a acompanhá-lo
+            self.popen = None
+            self.process = None
+            if state.get('pid') and self._current_process() is not None:
+                try:
+                    offset = os.path.getsize(self.output_path)
+                except OSError:
+                    offset = 0
+                self._watch(offset)
+                log_buffer.append(f"[painel] Acompanhando bot iniciado por outro processo do painel (PID {state['pid']})")
+
+    def _save(self, **changes):
+        self.state = {**self.state, **changes, 'updated_at': time.time()}
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        data = json.dumps(self.state, ensure_ascii=False).encode('utf-8')
+        atomic_write(self.state_path, [data])
+        self._state_mtime = os.stat(self.state_path).st_mtime_ns
+
+    def _current_process(self):
+        """``psutil.Process`` do bot registrado, se ainda for o mesmo processo e estiver vivo"""
+        pid = self.state.get('pid')
+        if not pid:
+            return None
+        proc = self.process
+        if proc is None or proc.pid != pid:
+            try:
+                proc = psutil.Process(pid)
+            except psutil.Error:
+                return None
+            # PID reaproveitado por outro programa?
+            created = self.state.get('create_time')
+            if created is not None and abs(proc.create_time() - created) > 1:
+                return None
+            self.process = proc
+        try:
+            if proc.status() == psutil.STATUS_ZOMBIE or not proc.is_running():
+                return None
+        except psutil.Error:
+            return None
+        return proc
+
+    def status(self):
+        """Status atual (``running``, ``stopped``, ...), conferindo se o processo ainda existe"""
+        with self.lock:
+            self._refresh()
+            status = self.state.get('status', 'stopped')
+            if status in ('running', 'starting') and self._current_process() is None:
+                with self.exclusive():
+                    if self.state.get('status') in ('running', 'starting') and self._current_process() is None:
+                        self._save(status='stopped', pid=None)
+                status = self.state.get('status', 'stopped')
+            return status
+
+    @property
+    def pid(self):
+        with self.lock:
+            self._refresh()
+            return self.state.get('pid')
+
+    def info(self):
+        status = self.status()
+        with self.lock:
+            return {
+                'status': status,
+                'pid': self.state.get('pid'),
+                'mode': self.state.get('mode'),
+                'started_at': self.state.get('started_at'),
+                'owner': self.state.get('owner'),
+                'adopted': self.popen is None and self.state.get('pid') is not None
+            }
+
+    def start(self, mode='normal'):
+        with self.exclusive():
+            return self._start(mode)
+
+    def stop(self):
+        with self.exclusive():
+            return self._stop()
+
+    def restart(self, mode='normal'):
+        """Para (se preciso) e inicia sem soltar a trava: nenhum ``start`` entra no meio"""
+        with self.exclusive():
+            if self._current_process() is not None:
+                self._stop()
+                time.sleep(BOT_RESTART_DELAY)
+            return self._start(mode)
+
+    def _start(self, mode):
+        if self._current_process() is not None:
+            raise BotBusy('Bot já está rodando')
+
+        if mode == 'dual':
+            cmd = ['npm', 'run', 'start:dual']
+        elif mode == 'code':
+            cmd = ['npm', 'start', '--', '--code']
         else:
-            bot_status = "stopped"
-            bot_process = None
-    except:
-        bot_status = "stopped"
-        bot_process = None
-    
-    return bot_status
+            cmd = ['npm', 'start']
 
-def monitor_bot_process():
-    """Monitor do processo do bot para emitir atualizações via WebSocket"""
-    global bot_process, bot_status
-    
-    while bot_process and bot_process.poll() is None:
-        time.sleep(1)
-    
-    # Processo terminou
-    bot_status = "stopped"
-    bot_process = None
+        self._save(status='starting', pid=None, mode=mode)
+        try:
+            os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+            # O_APPEND: depois que o arquivo é zerado, o bot continua escrevendo
+            # no novo fim em vez de no offset antigo (o que deixaria um buraco)
+            fd = os.open(self.output_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            with os.fdopen(fd, 'ab') as output:
+                offset = os.lseek(fd, 0, os.SEEK_END)
+                popen = subprocess.Popen(
+                    cmd,
+                    cwd=nazuna_path,
+                    stdin=subprocess.DEVNULL,
+                    stdout=output,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True
+                )
+            proc = psutil.Process(popen.pid)
+        except Exception:
+            self._save(status='error', pid=None)
+            raise
+
+        self.popen = popen
+        self.process = proc
+        self._save(status='running', pid=popen.pid, create_time=proc.create_time(),
+                   started_at=time.time(), owner=os.getpid())
+        self._watch(offset)
+        log_buffer.append(f'[painel] Bot iniciado em modo {mode} (PID {popen.pid})')
+        notify_status_change(event='start', pid=popen.pid)
+        return popen.pid
+
+    def _wait(self, proc, timeout):
+        """Espera o fim do processo; retorna o código de saída (None se desconhecido)"""
+        if self.popen is not None and self.popen.pid == proc.pid:
+            return self.popen.wait(timeout=timeout)
+        try:
+            return proc.wait(timeout=timeout)
+        except psutil.NoSuchProcess:
+            return None
+
+    def _stop(self):
+        proc = self._current_process()
+        if proc is None:
+            if self.state.get('status') != 'stopped':
+                self._save(status='stopped', pid=None)
+            raise BotBusy('Bot já está parado')
+
+        self._save(status='stopping')
+        try:
+            pgid = os.getpgid(proc.pid)
+        except OSError:
+            pgid = None
+
+        def signal_group(sig):
+            try:
+                if pgid is not None and pgid != os.getpgid(0):
+                    os.killpg(pgid, sig)
+                else:
+                    proc.send_signal(sig)
+            except (OSError, psutil.Error):
+                pass
+
+        signal_group(signal.SIGTERM)
+        try:
+            self._wait(proc, timeout=BOT_STOP_TIMEOUT)
+        except (subprocess.TimeoutExpired, psutil.TimeoutExpired):
+            # Se não terminar graciosamente, força a parada
+            signal_group(signal.SIGKILL)
+            try:
+                self._wait(proc, timeout=BOT_STOP_TIMEOUT)
+            except (subprocess.TimeoutExpired, psutil.TimeoutExpired):
+                pass
+
+        self._save(status='stopped', pid=None)
+        self.popen = None
+        self.process = None
+        notify_status_change(event='stop', pid=proc.pid)
+
+    def adopt(self):
+        """Na inicialização do painel, retoma o bot que continuou rodando (ou limpa o estado)"""
+        with self.exclusive():
+            if self._current_process() is None:
+                if self.state.get('status', 'stopped') != 'stopped':
+                    self._save(status='stopped', pid=None)
+                return None
+            notify_status_change(event='adopt', pid=self.state['pid'])
+            return self.state['pid']
+
+    def _watch(self, offset):
+        """Inicia as threads que acompanham a saída e o fim do processo atual"""
+        self.generation += 1
+        generation = self.generation
+        proc = self.process
+
+        def tracked(target, *args):
+            # Enquanto alguma das duas threads roda, este processo disputa a
+            # escrita do histórico em disco; depois a solta para a próxima execução
+            try:
+                target(*args)
+            finally:
+                bot_log_store.end()
+
+        for target, args in ((self._follow_output, (generation, proc, offset)),
+                             (self._monitor, (generation, proc))):
+            bot_log_store.begin()
+            thread = threading.Thread(target=tracked, args=(target, *args))
+            thread.daemon = True
+            thread.start()
+
+    def _monitor(self, generation, proc):
+        """Aguarda o fim do processo e avisa os listeners imediatamente"""
+        try:
+            return_code = self._wait(proc, timeout=None)
+        except Exception:
+            return_code = None
+
+        log_buffer.append(f'[painel] Processo do bot finalizado (código {return_code})')
+        with self.exclusive():
+            # Só altera o estado se ainda for o processo atual
+            if self.generation == generation and self.state.get('pid') == proc.pid:
+                self._save(status='stopped', pid=None)
+                self.popen = None
+                self.process = None
+        notify_status_change(event='exit', pid=proc.pid, return_code=return_code)
+
+    def _follow_output(self, generation, proc, offset):
+        """Acompanha ``logs/bot-output.log`` (como ``tail -f``) e alimenta o buffer de logs"""
+        partial = b''
+        try:
+            f = open(self.output_path, 'rb')
+        except OSError as e:
+            print(f"Erro ao abrir a saída do bot: {e}")
+            return
+
+        quiet_since = None
+        with f:
+            f.seek(offset)
+            while True:
+                data = f.read(65536)
+                if data:
+                    quiet_since = None
+                    lines = (partial + data).split(b'\n')
+                    partial = lines.pop()
+                    for line in lines:
+                        log_buffer.append(line.decode('utf-8', errors='replace').rstrip('\r'))
+                    continue
+
+                if self.generation != generation:
+                    break
+                try:
+                    if not proc.is_running() or proc.status() == psutil.STATUS_ZOMBIE:
+                        break
+                except psutil.Error:
+                    break
+
+                position = f.tell()
+                try:
+                    size = os.fstat(f.fileno()).st_size
+                except OSError:
+                    break
+                if size < position:
+                    # Arquivo zerado por outro processo (ou por fora): recomeça do início
+                    f.seek(0)
+                elif position > BOT_OUTPUT_MAX_BYTES and size == position:
+                    now = time.time()
+                    if quiet_since is None:
+                        quiet_since = now
+                    elif now - quiet_since >= BOT_OUTPUT_QUIET:
+                        quiet_since = None
+                        self._rotate_output(f, position)
+                time.sleep(BOT_OUTPUT_POLL)
+
+        self._release_output_rotation()
+        if partial:
+            log_buffer.append(partial.decode('utf-8', errors='replace').rstrip('\r'))
+
+    def _rotate_output(self, f, position):
+        """Zera ``bot-output.log`` depois que tudo foi lido.
+
+        Só o processo que obtém o ``flock`` de ``bot-output.lock`` faz isso
+        (e o mantém enquanto acompanha a saída), e só depois de a saída ficar
+        parada por ``BOT_OUTPUT_QUIET``: os outros processos, que leem a cada
+        ``BOT_OUTPUT_POLL``, já chegaram ao fim e apenas percebem que o
+        arquivo encolheu e voltam ao offset 0.
+        """
+        if self.rotation_lock is None:
+            lock_file = open(self.output_lock_path, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return
+            self.rotation_lock = lock_file
+        # Confere de novo logo antes de zerar para não perder o que o bot acabou de escrever
+        if os.fstat(f.fileno()).st_size == position:
+            os.truncate(self.output_path, 0)
+            f.seek(0)
+
+    def _release_output_rotation(self):
+        """Solta o ``flock`` de descarte para que outro processo que acompanha o bot assuma"""
+        lock_file, self.rotation_lock = self.rotation_lock, None
+        if lock_file is not None:
+            lock_file.close()
+
+# Supervisor compartilhado (o estado persistido vale para todos os processos do painel)
+bot_supervisor = BotSupervisor()
+
+# config.json do bot, mantido em memória e revalidado por mtime/tamanho
+config_store = ConfigStore(os.path.join(nazuna_path, 'dados', 'src', 'config.json'))
+
+def get_bot_status():
+    """Verifica o status atual do bot"""
+    return bot_supervisor.status()
 
 @bot_bp.route('/status', methods=['GET'])
 def status():
     """Retorna o status atual do bot"""
-    current_status = get_bot_status()
-    return jsonify({
-        'status': current_status,
-        'pid': bot_process.pid if bot_process else None
-    })
+    info = bot_supervisor.info()
+    return jsonify(info)
 
 @bot_bp.route('/start', methods=['POST'])
 def start_bot():
     """Inicia o bot Nazuna"""
-    global bot_process, bot_status
-    
     try:
-        # Verifica se o bot já está rodando
-        if get_bot_status() == "running":
-            return jsonify({
-                'success': False,
-                'message': 'Bot já está rodando'
-            }), 400
-        
         # Obtém configurações do request
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         mode = data.get('mode', 'normal')  # normal, dual, code
         
-        # Prepara o comando baseado no modo
-        if mode == 'dual':
-            cmd = ['npm', 'run', 'start:dual']
-        elif mode == 'code':
-            cmd = ['npm', 'start', '--', '--code']
-        else:
-            cmd = ['npm', 'start']
-        
-        # Inicia o processo do bot
-        bot_process = subprocess.Popen(
-            cmd,
-            cwd=nazuna_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
-        
-        bot_status = "starting"
-        
-        # Inicia thread para monitorar o processo
-        monitor_thread = threading.Thread(target=monitor_bot_process)
-        monitor_thread.daemon = True
-        monitor_thread.start()
+        pid = bot_supervisor.start(mode)
         
         return jsonify({
             'success': True,
             'message': f'Bot iniciado em modo {mode}',
-            'pid': bot_process.pid
+            'pid': pid
         })
         
+    except BotBusy as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
-        bot_status = "error"
+        notify_status_change(event='error')
         return jsonify({
             'success': False,
             'message': f'Erro ao iniciar o bot: {str(e)}'
@@ -112,35 +583,19 @@ def start_bot():
 @bot_bp.route('/stop', methods=['POST'])
 def stop_bot():
     """Para o bot Nazuna"""
-    global bot_process, bot_status
-    
     try:
-        if get_bot_status() == "stopped":
-            return jsonify({
-                'success': False,
-                'message': 'Bot já está parado'
-            }), 400
-        
-        if bot_process:
-            # Tenta terminar graciosamente
-            bot_process.terminate()
-            
-            # Aguarda um pouco para terminar graciosamente
-            try:
-                bot_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                # Se não terminar graciosamente, força a parada
-                bot_process.kill()
-                bot_process.wait()
-            
-            bot_process = None
-            bot_status = "stopped"
+        bot_supervisor.stop()
         
         return jsonify({
             'success': True,
             'message': 'Bot parado com sucesso'
         })
         
+    except BotBusy as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -151,35 +606,83 @@ def stop_bot():
 def restart_bot():
     """Reinicia o bot Nazuna"""
     try:
-        # Para o bot se estiver rodando
-        if get_bot_status() == "running":
-            stop_response = stop_bot()
-            if not stop_response[0].get_json().get('success'):
-                return stop_response
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', bot_supervisor.state.get('mode') or 'normal')
         
-        # Aguarda um momento antes de reiniciar
-        time.sleep(2)
+        pid = bot_supervisor.restart(mode)
         
-        # Inicia o bot novamente
-        return start_bot()
+        return jsonify({
+            'success': True,
+            'message': f'Bot reiniciado em modo {mode}',
+            'pid': pid
+        })
         
+    except BotBusy as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
+        notify_status_change(event='error')
         return jsonify({
             'success': False,
             'message': f'Erro ao reiniciar o bot: {str(e)}'
         }), 500
 
+def parse_log_time(value):
+    """Epoch em segundos ou data ISO 8601 (sem fuso = horário local)"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def get_log_history():
+    """Logs gravados em disco no período ``from``..``to`` (paginados por ``cursor``)"""
+    try:
+        start = parse_log_time(request.args.get('from'))
+        end = parse_log_time(request.args.get('to'))
+        cursor = request.args.get('cursor') or None
+        if cursor is not None and not re.fullmatch(r'\d+:\d+', cursor):
+            raise ValueError('cursor inválido')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Parâmetros de período inválidos: {str(e)}'
+        }), 400
+
+    limit = request.args.get('limit', 200, type=int)
+    limit = max(1, min(limit, LOG_PAGE_LIMIT))
+
+    logs, next_cursor = bot_log_store.query(start=start, end=end, limit=limit, cursor=cursor)
+    return jsonify({
+        'success': True,
+        'logs': logs,
+        'from': start,
+        'to': end,
+        'next_cursor': next_cursor
+    })
+
 @bot_bp.route('/logs', methods=['GET'])
 def get_logs():
-    """Retorna os logs do bot"""
+    """Retorna os logs do bot a partir do cursor ``since`` (ou do histórico em disco com ``from``/``to``)"""
     try:
-        # Por enquanto, retorna logs básicos
-        # Pode ser expandido para ler logs de arquivos específicos
+        if 'from' in request.args or 'to' in request.args:
+            return get_log_history()
+
+        since = request.args.get('since', 0, type=int)
+        limit = request.args.get('limit', 200, type=int)
+        limit = max(1, min(limit, LOG_PAGE_LIMIT))
+        
+        logs, dropped = log_buffer.read(since=max(since, 0), limit=limit)
+        
         return jsonify({
-            'logs': [
-                {'timestamp': '2025-01-14 10:00:00', 'level': 'info', 'message': 'Bot iniciado'},
-                {'timestamp': '2025-01-14 10:01:00', 'level': 'info', 'message': 'Conectado ao WhatsApp'},
-            ]
+            'success': True,
+            'logs': logs,
+            'next': logs[-1]['seq'] if logs else min(max(since, log_buffer.first_seq - 1), log_buffer.last_seq),
+            'last': log_buffer.last_seq,
+            'dropped': dropped
         })
         
     except Exception as e:
@@ -188,25 +691,52 @@ def get_logs():
             'message': f'Erro ao obter logs: {str(e)}'
         }), 500
 
+@bot_bp.route('/resources', methods=['GET'])
+def get_resources():
+    """Retorna o consumo de recursos da árvore de processos do bot"""
+    try:
+        from src.routes.system import metrics_sampler
+        
+        history = request.args.get('history', 0, type=int)
+        metrics_sampler.start()
+        tracker = metrics_sampler.bot_tracker
+        
+        return jsonify({
+            'success': True,
+            'status': get_bot_status(),
+            'resources': tracker.summary(),
+            'history': tracker.history(limit=history) if history else []
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao obter recursos do bot: {str(e)}'
+        }), 500
+
 @bot_bp.route('/config', methods=['GET'])
 def get_config():
-    """Retorna a configuração atual do bot"""
+    """Retorna a configuração atual do bot (em cache; 304 se o hash não mudou)"""
     try:
-        config_path = os.path.join(nazuna_path, 'dados', 'src', 'config.json')
-        
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                import json
-                config = json.load(f)
-                return jsonify({
-                    'success': True,
-                    'config': config
-                })
-        else:
+        try:
+            current = config_store.get()
+        except FileNotFoundError:
             return jsonify({
                 'success': False,
                 'message': 'Arquivo de configuração não encontrado'
             }), 404
+        
+        if current['hash'] in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = jsonify({
+                'success': True,
+                'config': current['config'],
+                'hash': current['hash']
+            })
+        response.set_etag(current['hash'])
+        response.cache_control.no_cache = True
+        return response
             
     except Exception as e:
         return jsonify({
@@ -214,12 +744,38 @@ def get_config():
             'message': f'Erro ao ler configuração: {str(e)}'
         }), 500
 
+def config_write_response(write, payload):
+    """Executa ``write(payload, base_hash)`` e traduz conflitos e erros de validação"""
+    # Hash da versão lida pelo cliente (If-Match), para não sobrescrever outra edição
+    base_hash = request.headers.get('If-Match', '').strip('"') or request.args.get('base_hash')
+    
+    try:
+        result = write(payload, base_hash)
+    except ConfigValidationError as e:
+        return jsonify({
+            'success': False,
+            'message': 'Configuração inválida',
+            'errors': e.errors
+        }), 422
+    except WriteConflict as e:
+        return jsonify({
+            'success': False,
+            'message': 'Configuração modificada por outra operação',
+            'hash': e.current_hash
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'message': 'Configuração atualizada com sucesso',
+        'config': result['config'],
+        'hash': result['hash']
+    })
+
 @bot_bp.route('/config', methods=['POST'])
 def update_config():
-    """Atualiza a configuração do bot"""
+    """Substitui a configuração do bot"""
     try:
-        config_path = os.path.join(nazuna_path, 'dados', 'src', 'config.json')
-        new_config = request.get_json()
+        new_config = request.get_json(silent=True)
         
         if not new_config:
             return jsonify({
@@ -227,18 +783,35 @@ def update_config():
                 'message': 'Configuração inválida'
             }), 400
         
-        with open(config_path, 'w', encoding='utf-8') as f:
-            import json
-            json.dump(new_config, f, indent=2, ensure_ascii=False)
+        return config_write_response(config_store.replace, new_config)
         
+    except Exception as e:
         return jsonify({
-            'success': True,
-            'message': 'Configuração atualizada com sucesso'
-        })
+            'success': False,
+            'message': f'Erro ao atualizar configuração: {str(e)}'
+        }), 500
+
+@bot_bp.route('/config', methods=['PATCH'])
+def patch_config():
+    """Altera chaves individuais da configuração (JSON Merge Patch: ``null`` remove a chave)"""
+    try:
+        changes = request.get_json(silent=True)
+        
+        if not isinstance(changes, dict) or not changes:
+            return jsonify({
+                'success': False,
+                'message': 'Nenhuma alteração enviada'
+            }), 400
+        
+        return config_write_response(config_store.patch, changes)
         
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'message': 'Arquivo de configuração não encontrado'
+        }), 404
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Erro ao atualizar configuração: {str(e)}'
         }), 500
-
@@ -1,18 +1,481 @@
 import os
 import shutil
-from flask import Blueprint, jsonify, request, send_file
+import hashlib
+import tempfile
+import threading
+import time
+import uuid
+import unicodedata
+from collections import OrderedDict
+from contextlib import nullcontext
+from urllib.parse import quote
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 import mimetypes
+from src.archive import ARCHIVE_FORMATS, archive_name, archive_stream
 
 files_bp = Blueprint('files', __name__)
 
-# Diretório base para operações de arquivo (restrito ao projeto Nazuna)
-BASE_DIR = "/home/ubuntu/nazuna"
+# Diretório base para operações de arquivo (restrito ao projeto Nazuna;
+# NAZUNA_DIR aponta para outra instalação, ex.: nos benchmarks)
+BASE_DIR = os.environ.get('NAZUNA_DIR', "/home/ubuntu/nazuna")
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 
 # Criar diretório de upload se não existir
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Backups em arquivo (a pasta ``backups/`` criada pelo start.sh, na raiz do painel)
+BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'backups')
+ARCHIVE_DEFAULT_LEVEL = 6
+ARCHIVE_MIMETYPES = {'zip': 'application/zip', 'tar.gz': 'application/gzip', 'tar': 'application/x-tar'}
+
+# Cache de listagens de diretório
+LISTING_CACHE_SIZE = 128      # diretórios mantidos em cache
+LISTING_CACHE_TTL = 30        # segundos (tamanhos/datas dos arquivos não alteram o mtime do diretório)
+LISTING_DEFAULT_LIMIT = 500
+LISTING_MAX_LIMIT = 5000
+LISTING_FIELDS = ('name', 'type', 'path', 'size', 'modified')
+LISTING_SORT_KEYS = {
+    'name': lambda item: item['name'],
+    'size': lambda item: item['size'],
+    'modified': lambda item: item['modified'],
+    'type': lambda item: (item['type'] != 'directory', item['name'])
+}
+
+class DirectoryListingCache:
+    """Cache das listagens de diretório, invalidado pelo mtime do diretório.
+
+    Cada diretório é lido uma única vez com ``os.scandir`` (o tipo vem do
+    próprio dirent, sem ``stat`` extra) e as ordenações pedidas são
+    guardadas junto. Criar, apagar ou renomear entradas muda o mtime do
+    diretório e descarta o cache; alterações feitas pelo próprio painel
+    chamam ``invalidate``. O TTL limita quanto tempo tamanho e data de
+    arquivos alterados por fora podem ficar desatualizados.
+    """
+
+    def __init__(self, max_entries=LISTING_CACHE_SIZE, ttl=LISTING_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _scan(self, full_path):
+        items = []
+        with os.scandir(full_path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):  # Pula arquivos ocultos
+                    continue
+                try:
+                    stat = entry.stat()
+                    items.append({
+                        'name': entry.name,
+                        'type': 'directory' if entry.is_dir() else 'file',
+                        'size': stat.st_size,
+                        'modified': stat.st_mtime
+                    })
+                except OSError:
+                    continue
+        return items
+
+    def get(self, full_path, sort='name', reverse=False):
+        """Retorna ``(itens ordenados, versão)`` de um diretório"""
+        version = os.stat(full_path).st_mtime_ns
+        now = time.monotonic()
+
+        with self.lock:
+            cached = self.entries.get(full_path)
+            if cached and (cached['version'] != version or now - cached['time'] > self.ttl):
+                cached = None
+            if cached:
+                self.entries.move_to_end(full_path)
+
+        if cached is None:
+            cached = {'version': version, 'time': now, 'items': self._scan(full_path), 'sorted': {}}
+            with self.lock:
+                self.entries[full_path] = cached
+                self.entries.move_to_end(full_path)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        key = (sort, reverse)
+        ordered = cached['sorted'].get(key)
+        if ordered is None:
+            ordered = sorted(cached['items'], key=LISTING_SORT_KEYS[sort], reverse=reverse)
+            cached['sorted'][key] = ordered
+        return ordered, version
+
+    def invalidate(self, full_path):
+        """Descarta o cache de um diretório"""
+        with self.lock:
+            self.entries.pop(os.path.normpath(full_path), None)
+
+    def apply(self, full_path, changes):
+        """Aplica ``{nome: item ou None}`` à listagem em cache, sem reler o diretório.
+
+        Usado pelo observador de arquivos: a versão passa a ser o mtime
+        atual do diretório e o TTL recomeça. Se algo falhar, o cache do
+        diretório é descartado.
+        """
+        full_path = os.path.normpath(full_path)
+        try:
+            version = os.stat(full_path).st_mtime_ns
+        except OSError:
+            self.invalidate(full_path)
+            return
+
+        with self.lock:
+            cached = self.entries.get(full_path)
+            if cached is None:
+                return
+            items = [item for item in cached['items'] if item['name'] not in changes]
+            items.extend(item for item in changes.values() if item is not None)
+            self.entries[full_path] = {'version': version, 'time': time.monotonic(), 'items': items, 'sorted': {}}
+
+# Cache compartilhado pelas rotas de arquivos
+listing_cache = DirectoryListingCache()
+
+def invalidate_listing(full_path):
+    """Invalida a listagem do diretório que contém ``full_path``"""
+    listing_cache.invalidate(os.path.dirname(os.path.normpath(full_path)))
+
+# ETags por conteúdo: arquivos até este tamanho têm o hash calculado (e guardado em cache)
+ETAG_HASH_MAX_SIZE = 16 * 1024 * 1024
+ETAG_CACHE_SIZE = 1024
+
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+def file_version(stat):
+    """Versão do arquivo pelos metadados (inode, mtime, tamanho), sem ler o conteúdo"""
+    return f'{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+def file_etag(full_path, stat=None):
+    """ETag forte de um arquivo.
+
+    Arquivos pequenos usam o hash do conteúdo, calculado uma vez por
+    (inode, mtime, tamanho). Arquivos grandes (mídias, backups) usam esses
+    mesmos metadados, evitando ler centenas de MB só para gerar o ETag.
+    """
+    stat = stat or os.stat(full_path)
+    key = (full_path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    if stat.st_size > ETAG_HASH_MAX_SIZE:
+        return file_version(stat)
+
+    with _etag_lock:
+        etag = _etag_cache.get(key)
+        if etag is not None:
+            _etag_cache.move_to_end(key)
+            return etag
+
+    digest = hashlib.sha1()
+    with open(full_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()
+
+    with _etag_lock:
+        _etag_cache[key] = etag
+        while len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+# Leitura em janelas para o editor
+READ_FULL_MAX = 2 * 1024 * 1024         # arquivos até este tamanho podem ser lidos inteiros
+READ_DEFAULT_WINDOW = 256 * 1024
+READ_MAX_WINDOW = 4 * 1024 * 1024
+READ_DEFAULT_LINES = 1000
+READ_MAX_LINES = 20000
+LINE_INDEX_STRIDE = 1000                # guarda o offset de uma a cada N linhas
+LINE_INDEX_CACHE_SIZE = 32
+LINE_INDEX_BLOCK = 1024 * 1024
+
+class LineIndex:
+    """Índice esparso de linhas de um arquivo.
+
+    Guarda o offset em bytes do início de cada ``LINE_INDEX_STRIDE``-ésima
+    linha, o que mantém a memória pequena (2 mil inteiros para 2 milhões de
+    linhas). Para ir a uma linha basta um ``seek`` até a entrada anterior e
+    ler no máximo ``LINE_INDEX_STRIDE`` linhas. Se o arquivo só cresceu
+    (log), o índice é estendido a partir do ponto onde parou.
+    """
+
+    TAIL_CHECK = 4096
+
+    def __init__(self, full_path):
+        self.full_path = full_path
+        self.offsets = [0]
+        self.newlines = 0      # quantidade de '\n' até ``indexed_size``
+        self.indexed_size = 0  # fim da última linha completa indexada
+        self.size = 0
+        self.key = None
+        self.tail = b''
+        self.lock = threading.Lock()
+
+    @property
+    def total_lines(self):
+        return self.newlines + (1 if self.size > self.indexed_size else 0)
+
+    def _read_tail(self, f):
+        start = max(0, self.indexed_size - self.TAIL_CHECK)
+        f.seek(start)
+        return f.read(self.indexed_size - start)
+
+    def refresh(self, stat, f=None):
+        """Atualiza o índice para o estado do arquivo (``f``, se já aberto, é usado na leitura)"""
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self.key:
+            return
+
+        with (open(self.full_path, 'rb') if f is None else nullcontext(f)) as f:
+            appended = (
+                self.key is not None
+                and stat.st_ino == self.key[0]
+                and stat.st_size >= self.indexed_size
+                and self._read_tail(f) == self.tail
+            )
+            if not appended:
+                self.offsets = [0]
+                self.newlines = 0
+                self.indexed_size = 0
+
+            self._scan(f, stat.st_size)
+            self.tail = self._read_tail(f)
+
+        self.size = stat.st_size
+        self.key = key
+
+    def _scan(self, f, size):
+        position = self.indexed_size
+        f.seek(position)
+
+        while position < size:
+            block = f.read(min(LINE_INDEX_BLOCK, size - position))
+            if not block:
+                break
+
+            count = block.count(b'\n')
+            next_mark = (self.newlines // LINE_INDEX_STRIDE + 1) * LINE_INDEX_STRIDE
+            if self.newlines + count >= next_mark:
+                start = 0
+                for _ in range(count):
+                    start = block.index(b'\n', start) + 1
+                    self.newlines += 1
+                    if self.newlines % LINE_INDEX_STRIDE == 0:
+                        self.offsets.append(position + start)
+            else:
+                self.newlines += count
+
+            last_newline = block.rfind(b'\n')
+            if last_newline >= 0:
+                self.indexed_size = position + last_newline + 1
+            position += len(block)
+
+    def snapshot(self):
+        """Estado consistente para uma leitura; chamar com ``lock``"""
+        return LineIndexSnapshot(self.offsets, len(self.offsets), self.total_lines)
+
+class LineIndexSnapshot:
+    """Visão do ``LineIndex`` no momento da leitura.
+
+    ``refresh`` só acrescenta offsets à lista ou troca a lista inteira, então
+    os ``count`` primeiros offsets guardados aqui não mudam mesmo que outra
+    requisição atualize o índice durante a leitura.
+    """
+
+    __slots__ = ('offsets', 'count', 'total_lines')
+
+    def __init__(self, offsets, count, total_lines):
+        self.offsets = offsets
+        self.count = count
+        self.total_lines = total_lines
+
+    def seek_line(self, f, line):
+        """Posiciona ``f`` no início da linha ``line`` (0-based)"""
+        mark = min(line // LINE_INDEX_STRIDE, self.count - 1)
+        f.seek(self.offsets[mark])
+        for _ in range(line - mark * LINE_INDEX_STRIDE):
+            if not f.readline():
+                break
+
+_line_indexes = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+def get_line_index(full_path, stat, f=None):
+    """Retrato do índice de linhas em cache, atualizado para (inode, mtime, tamanho)"""
+    with _line_indexes_lock:
+        index = _line_indexes.get(full_path)
+        if index is None:
+            index = LineIndex(full_path)
+            _line_indexes[full_path] = index
+        _line_indexes.move_to_end(full_path)
+        while len(_line_indexes) > LINE_INDEX_CACHE_SIZE:
+            _line_indexes.popitem(last=False)
+    with index.lock:
+        index.refresh(stat, f)
+        return index.snapshot()
+
+def decode_text(data, partial=False):
+    """Decodifica como UTF-8 (ou latin-1); com ``partial`` ignora um caractere cortado no fim"""
+    try:
+        return data.decode('utf-8'), 'utf-8', len(data)
+    except UnicodeDecodeError as e:
+        if partial and e.start >= len(data) - 3 and e.reason == 'unexpected end of data':
+            return data[:e.start].decode('utf-8'), 'utf-8', e.start
+        return data.decode('latin-1'), 'latin-1', len(data)
+
+# Escrita atômica e controle de concorrência otimista
+HASH_CACHE_SIZE = 256
+WRITE_LOCK_STRIPES = 64
+COPY_BLOCK = 1024 * 1024
+
+_hash_cache = OrderedDict()
+_hash_lock = threading.Lock()
+_write_locks = [threading.Lock() for _ in range(WRITE_LOCK_STRIPES)]
+
+class WriteConflict(Exception):
+    """O arquivo mudou desde a versão (hash) em que o cliente se baseou"""
+
+    def __init__(self, current_hash):
+        super().__init__('Arquivo modificado por outra operação')
+        self.current_hash = current_hash
+
+def write_lock(full_path):
+    """Lock (por faixa de caminhos) que serializa escritas no mesmo arquivo"""
+    return _write_locks[hash(os.path.normpath(full_path)) % WRITE_LOCK_STRIPES]
+
+def content_hash(full_path):
+    """SHA-256 do conteúdo, em cache por (inode, mtime, tamanho); None se não existir"""
+    try:
+        stat = os.stat(full_path)
+    except FileNotFoundError:
+        return None
+    key = (os.path.normpath(full_path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    with _hash_lock:
+        cached = _hash_cache.get(key)
+        if cached is not None:
+            _hash_cache.move_to_end(key)
+            return cached
+
+    digest = hashlib.sha256()
+    with open(full_path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b''):
+            digest.update(block)
+    result = digest.hexdigest()
+    _remember_hash(key, result)
+    return result
+
+def _remember_hash(key, value):
+    with _hash_lock:
+        _hash_cache[key] = value
+        _hash_cache.move_to_end(key)
+        while len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+
+def atomic_write(full_path, chunks):
+    """Grava ``chunks`` (bytes) num temporário, faz fsync e o renomeia sobre ``full_path``.
+
+    Uma queda no meio da escrita deixa o arquivo antigo intacto. Retorna o
+    SHA-256 do novo conteúdo.
+    """
+    directory = os.path.dirname(full_path)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(full_path)}.', suffix='.tmp', dir=directory)
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Preserva as permissões do arquivo original
+        try:
+            os.chmod(temp_path, os.stat(full_path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+
+        os.replace(temp_path, full_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    # Garante que a renomeação também foi para o disco
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+    result = digest.hexdigest()
+    stat = os.stat(full_path)
+    _remember_hash((os.path.normpath(full_path), stat.st_ino, stat.st_mtime_ns, stat.st_size), result)
+    return result
+
+def check_base_hash(full_path, base_hash):
+    """Levanta ``WriteConflict`` se o arquivo atual não corresponder a ``base_hash``.
+
+    ``base_hash`` pode ser o SHA-256 do conteúdo ou a versão por metadados
+    (``file_version``) devolvida pelas leituras em janela; esta é conferida
+    sem ler o arquivo.
+    """
+    if base_hash is None:
+        return
+    if '-' in base_hash:
+        try:
+            current = file_version(os.stat(full_path))
+        except FileNotFoundError:
+            current = None
+    else:
+        current = content_hash(full_path)
+    if current != base_hash:
+        raise WriteConflict(current)
+
+def patched_chunks(full_path, edits):
+    """Gera o novo conteúdo aplicando ``edits`` ao arquivo atual sem carregá-lo inteiro.
+
+    Cada edição é ``{'offset': int, 'delete': int, 'insert': str}`` com
+    posições em bytes relativas ao conteúdo base; as edições não podem se
+    sobrepor.
+    """
+    size = os.path.getsize(full_path)
+    ops = sorted(
+        (int(e.get('offset', 0)), int(e.get('delete', 0)), e.get('insert', '').encode('utf-8'))
+        for e in edits
+    )
+    position = 0
+    for offset, delete, _ in ops:
+        if offset < position or delete < 0 or offset + delete > size:
+            raise ValueError('Patch inválido: edições fora do arquivo ou sobrepostas')
+        position = offset + delete
+
+    def generate():
+        with open(full_path, 'rb') as f:
+            position = 0
+            for offset, delete, insert in ops:
+                remaining = offset - position
+                while remaining > 0:
+                    block = f.read(min(COPY_BLOCK, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    yield block
+                if insert:
+                    yield insert
+                position = offset + delete
+                f.seek(position)
+            for block in iter(lambda: f.read(COPY_BLOCK), b''):
+                yield block
+
+    return generate()
+
 def is_safe_path(path):
     """Verifica se o caminho está dentro do diretório permitido"""
     try:
@@ -24,10 +487,10 @@ def is_safe_path(path):
 
 @files_bp.route('/list', methods=['GET'])
 def list_files():
-    """Lista arquivos e diretórios"""
+    """Lista arquivos e diretórios (com ordenação, paginação e seleção de campos)"""
     try:
         path = request.args.get('path', '')
-        full_path = os.path.join(BASE_DIR, path.lstrip('/'))
+        full_path = os.path.normpath(os.path.join(BASE_DIR, path.lstrip('/')))
         
         if not is_safe_path(full_path):
             return jsonify({
@@ -41,44 +504,53 @@ def list_files():
                 'message': 'Caminho não encontrado'
             }), 404
         
+        sort = request.args.get('sort', 'name')
+        if sort not in LISTING_SORT_KEYS:
+            return jsonify({
+                'success': False,
+                'message': 'Ordenação inválida'
+            }), 400
+        reverse = request.args.get('order', 'asc') == 'desc'
+        
+        fields = request.args.get('fields')
+        fields = [f for f in fields.split(',') if f in LISTING_FIELDS] if fields else list(LISTING_FIELDS)
+        
+        limit = request.args.get('limit', LISTING_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, LISTING_MAX_LIMIT))
+        offset = max(0, request.args.get('cursor', 0, type=int))
+        
+        listing, version = listing_cache.get(full_path, sort=sort, reverse=reverse)
+        page = listing[offset:offset + limit]
+        
         items = []
         
         # Adiciona item para voltar ao diretório pai (se não estiver na raiz)
-        if path and path != '/':
+        if path and path != '/' and offset == 0:
             parent_path = os.path.dirname(path.rstrip('/'))
-            items.append({
+            parent = {
                 'name': '..',
                 'type': 'directory',
                 'path': parent_path,
                 'size': 0,
                 'modified': None
-            })
+            }
+            items.append({f: parent[f] for f in fields})
         
-        # Lista itens do diretório
-        for item in sorted(os.listdir(full_path)):
-            if item.startswith('.'):  # Pula arquivos ocultos
-                continue
-                
-            item_path = os.path.join(full_path, item)
-            relative_path = os.path.join(path, item).replace('\\', '/')
-            
-            try:
-                stat = os.stat(item_path)
-                
-                items.append({
-                    'name': item,
-                    'type': 'directory' if os.path.isdir(item_path) else 'file',
-                    'path': relative_path,
-                    'size': stat.st_size,
-                    'modified': stat.st_mtime
-                })
-            except:
-                continue
+        for item in page:
+            entry = {f: item[f] for f in fields if f != 'path'}
+            if 'path' in fields:
+                entry['path'] = os.path.join(path, item['name']).replace('\\', '/')
+            items.append(entry)
+        
+        next_offset = offset + len(page)
         
         return jsonify({
             'success': True,
             'path': path,
-            'items': items
+            'items': items,
+            'total': len(listing),
+            'next_cursor': str(next_offset) if next_offset < len(listing) else None,
+            'version': str(version)
         })
         
     except Exception as e:
@@ -128,19 +600,93 @@ def read_file():
                 'message': 'Tipo de arquivo não suportado para leitura'
             }), 400
         
-        try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # Tenta com encoding latin-1 se UTF-8 falhar
-            with open(full_path, 'r', encoding='latin-1') as f:
-                content = f.read()
+        stat = os.stat(full_path)
+        line = request.args.get('line', type=int)
+        offset = request.args.get('offset', type=int)
+        
+        # Arquivo pequeno sem janela pedida: comportamento original (conteúdo inteiro)
+        if line is None and offset is None and stat.st_size <= READ_FULL_MAX:
+            with open(full_path, 'rb') as f:
+                raw = f.read()
+            content, encoding, _ = decode_text(raw)
+            
+            return jsonify({
+                'success': True,
+                'content': content,
+                'path': path,
+                'size': len(content),
+                'file_size': stat.st_size,
+                'hash': hashlib.sha256(raw).hexdigest(),
+                'encoding': encoding,
+                'has_more': False
+            })
+        
+        if line is not None:
+            # Janela por linhas (1-based), usando o índice esparso de linhas
+            line = max(1, line)
+            count = request.args.get('lines', READ_DEFAULT_LINES, type=int)
+            count = max(1, min(count, READ_MAX_LINES))
+            
+            chunks = []
+            read_bytes = 0
+            with open(full_path, 'rb') as f:
+                # Índice e leitura sobre o mesmo arquivo aberto, mesmo que o caminho seja substituído
+                stat = os.fstat(f.fileno())
+                index = get_line_index(full_path, stat, f)
+                index.seek_line(f, line - 1)
+                start = f.tell()
+                for _ in range(count):
+                    chunk = f.readline(READ_MAX_WINDOW - read_bytes)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    read_bytes += len(chunk)
+                    if read_bytes >= READ_MAX_WINDOW:
+                        break
+                end = f.tell()
+            
+            content, encoding, _ = decode_text(b''.join(chunks), partial=True)
+            
+            return jsonify({
+                'success': True,
+                'content': content,
+                'path': path,
+                'size': len(content),
+                'file_size': stat.st_size,
+                'hash': file_version(stat),
+                'encoding': encoding,
+                'line': line,
+                'lines': len(chunks),
+                'total_lines': index.total_lines,
+                'offset': start,
+                'end': end,
+                'has_more': end < stat.st_size
+            })
+        
+        # Janela por bytes
+        offset = max(0, offset or 0)
+        length = request.args.get('length', READ_DEFAULT_WINDOW, type=int)
+        length = max(1, min(length, READ_MAX_WINDOW))
+        
+        with open(full_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        
+        # Não corta um caractere UTF-8 ao meio; o próximo pedido começa em ``end``
+        content, encoding, used = decode_text(data, partial=True)
+        end = offset + used
         
         return jsonify({
             'success': True,
             'content': content,
             'path': path,
-            'size': len(content)
+            'size': len(content),
+            'file_size': stat.st_size,
+            'hash': file_version(stat),
+            'encoding': encoding,
+            'offset': offset,
+            'end': end,
+            'has_more': end < stat.st_size
         })
         
     except Exception as e:
@@ -151,17 +697,17 @@ def read_file():
 
 @files_bp.route('/write', methods=['POST'])
 def write_file():
-    """Escreve conteúdo em um arquivo"""
+    """Escreve conteúdo em um arquivo (inteiro ou como patch sobre ``base_hash``)"""
     try:
         data = request.get_json()
-        if not data or 'path' not in data or 'content' not in data:
+        if not data or 'path' not in data or ('content' not in data and 'patch' not in data):
             return jsonify({
                 'success': False,
                 'message': 'Caminho ou conteúdo não fornecido'
             }), 400
         
         path = data['path']
-        content = data['content']
+        base_hash = data.get('base_hash')
         
         full_path = os.path.join(BASE_DIR, path.lstrip('/'))
         
@@ -171,16 +717,41 @@ def write_file():
                 'message': 'Caminho não permitido'
             }), 403
         
+        if 'patch' in data and (base_hash is None or not os.path.isfile(full_path)):
+            return jsonify({
+                'success': False,
+                'message': 'Patch exige base_hash de um arquivo existente'
+            }), 400
+        
         # Cria diretórios pai se necessário
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
         
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        try:
+            with write_lock(full_path):
+                check_base_hash(full_path, base_hash)
+                if 'patch' in data:
+                    chunks = patched_chunks(full_path, data['patch'])
+                else:
+                    chunks = [data['content'].encode('utf-8')]
+                new_hash = atomic_write(full_path, chunks)
+        except WriteConflict as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                'hash': e.current_hash
+            }), 409
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        invalidate_listing(full_path)
         
         return jsonify({
             'success': True,
             'message': 'Arquivo salvo com sucesso',
-            'path': path
+            'path': path,
+            'hash': new_hash
         })
         
     except Exception as e:
@@ -232,6 +803,7 @@ def upload_file():
         
         # Salva o arquivo
         file.save(file_path)
+        invalidate_listing(file_path)
         
         # Caminho relativo para retorno
         relative_path = os.path.relpath(file_path, BASE_DIR)
@@ -249,9 +821,380 @@ def upload_file():
             'message': f'Erro ao fazer upload: {str(e)}'
         }), 500
 
+# Uploads em partes (chunked/resumable)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024        # tamanho de parte sugerido ao cliente
+UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+UPLOAD_MAX_SIZE = 8 * 1024 * 1024 * 1024
+UPLOAD_EXPIRY = 24 * 3600                  # uploads parados são descartados após este tempo
+UPLOAD_IO_BLOCK = 1024 * 1024
+
+class ChunkedUpload:
+    """Upload em partes gravado direto em um arquivo temporário.
+
+    O temporário fica no diretório de destino (oculto), de modo que o
+    ``finalize`` é um ``os.replace`` atômico. Cada parte é escrita com
+    ``os.pwrite`` na sua posição, o que permite enviar partes em paralelo
+    e reenviar apenas as que faltam após uma queda de conexão.
+    """
+
+    def __init__(self, upload_id, dest_path, size, checksum=None):
+        self.upload_id = upload_id
+        self.dest_path = dest_path
+        self.size = size
+        self.checksum = checksum
+        self.temp_path = os.path.join(
+            os.path.dirname(dest_path),
+            f'.{os.path.basename(dest_path)}.upload-{upload_id}'
+        )
+        self.ranges = []  # intervalos [início, fim) já recebidos e verificados
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+        fd = os.open(self.temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+    def write_chunk(self, offset, stream, length, expected=None):
+        """Grava ``length`` bytes de ``stream`` em ``offset``; devolve o sha256 calculado"""
+        digest = hashlib.sha256()
+        fd = os.open(self.temp_path, os.O_WRONLY)
+        try:
+            position = offset
+            remaining = length
+            while remaining > 0:
+                block = stream.read(min(UPLOAD_IO_BLOCK, remaining))
+                if not block:
+                    raise ValueError('Parte incompleta')
+                digest.update(block)
+                while block:
+                    written = os.pwrite(fd, block, position)
+                    block = block[written:]
+                    position += written
+                remaining = length - (position - offset)
+        finally:
+            os.close(fd)
+
+        checksum = digest.hexdigest()
+        if expected and checksum != expected.lower():
+            raise ValueError('Checksum da parte não confere')
+
+        with self.lock:
+            self.ranges = merge_range(self.ranges, offset, offset + length)
+            self.updated = time.time()
+        return checksum
+
+    @property
+    def received(self):
+        return sum(end - start for start, end in self.ranges)
+
+    @property
+    def complete(self):
+        return self.ranges == [[0, self.size]] or self.size == 0
+
+    def missing(self):
+        """Intervalos que ainda faltam receber"""
+        gaps = []
+        position = 0
+        for start, end in self.ranges:
+            if start > position:
+                gaps.append([position, start])
+            position = end
+        if position < self.size:
+            gaps.append([position, self.size])
+        return gaps
+
+    def status(self):
+        with self.lock:
+            return {
+                'upload_id': self.upload_id,
+                'path': os.path.relpath(self.dest_path, BASE_DIR),
+                'size': self.size,
+                'received': self.received,
+                'ranges': [list(r) for r in self.ranges],
+                'missing': self.missing(),
+                'complete': self.complete
+            }
+
+    def finalize(self):
+        """Confere o arquivo e o move atomicamente para o destino"""
+        with self.lock:
+            if not self.complete:
+                raise ValueError('Upload incompleto')
+
+        if self.checksum:
+            digest = hashlib.sha256()
+            with open(self.temp_path, 'rb') as f:
+                for block in iter(lambda: f.read(UPLOAD_IO_BLOCK), b''):
+                    digest.update(block)
+            if digest.hexdigest() != self.checksum.lower():
+                raise ValueError('Checksum do arquivo não confere')
+
+        fd = os.open(self.temp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(self.temp_path, self.dest_path)
+
+    def abort(self):
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+def merge_range(ranges, start, end):
+    """Insere o intervalo [start, end) numa lista ordenada, unindo sobreposições"""
+    merged = []
+    for current in sorted(ranges + [[start, end]]):
+        if merged and current[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], current[1])
+        else:
+            merged.append(list(current))
+    return merged
+
+# Uploads em andamento por id
+chunked_uploads = {}
+chunked_uploads_lock = threading.Lock()
+
+def expire_uploads():
+    """Remove uploads abandonados há mais de ``UPLOAD_EXPIRY``"""
+    now = time.time()
+    with chunked_uploads_lock:
+        expired = [u for u in chunked_uploads.values() if now - u.updated > UPLOAD_EXPIRY]
+        for upload in expired:
+            del chunked_uploads[upload.upload_id]
+    for upload in expired:
+        upload.abort()
+
+def get_chunked_upload(upload_id):
+    with chunked_uploads_lock:
+        return chunked_uploads.get(upload_id)
+
+@files_bp.route('/upload/init', methods=['POST'])
+def upload_init():
+    """Inicia um upload em partes"""
+    try:
+        data = request.get_json()
+        if not data or 'filename' not in data or 'size' not in data:
+            return jsonify({
+                'success': False,
+                'message': 'Nome ou tamanho do arquivo não fornecido'
+            }), 400
+        
+        filename = secure_filename(data['filename'])
+        size = int(data['size'])
+        if not filename or size < 0 or size > UPLOAD_MAX_SIZE:
+            return jsonify({
+                'success': False,
+                'message': 'Nome ou tamanho do arquivo inválido'
+            }), 400
+        
+        dest_path = data.get('path', '')
+        if dest_path:
+            full_dest_path = os.path.join(BASE_DIR, dest_path.lstrip('/'))
+        else:
+            full_dest_path = UPLOAD_DIR
+        
+        if not is_safe_path(full_dest_path):
+            return jsonify({
+                'success': False,
+                'message': 'Caminho de destino não permitido'
+            }), 403
+        
+        os.makedirs(full_dest_path, exist_ok=True)
+        expire_uploads()
+        
+        upload = ChunkedUpload(
+            uuid.uuid4().hex,
+            os.path.join(full_dest_path, filename),
+            size,
+            checksum=data.get('checksum')
+        )
+        with chunked_uploads_lock:
+            chunked_uploads[upload.upload_id] = upload
+        
+        return jsonify({
+            'success': True,
+            'upload_id': upload.upload_id,
+            'chunk_size': UPLOAD_CHUNK_SIZE,
+            'max_chunk_size': UPLOAD_MAX_CHUNK_SIZE,
+            'filename': filename
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao iniciar upload: {str(e)}'
+        }), 500
+
+@files_bp.route('/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Recebe uma parte do upload (corpo bruto) na posição ``offset``"""
+    try:
+        upload = get_chunked_upload(upload_id)
+        if upload is None:
+            return jsonify({
+                'success': False,
+                'message': 'Upload não encontrado'
+            }), 404
+        
+        offset = request.args.get('offset', type=int)
+        length = request.content_length
+        if offset is None or length is None:
+            return jsonify({
+                'success': False,
+                'message': 'Offset ou Content-Length não fornecido'
+            }), 400
+        
+        if offset < 0 or length > UPLOAD_MAX_CHUNK_SIZE or offset + length > upload.size:
+            return jsonify({
+                'success': False,
+                'message': 'Parte fora dos limites do arquivo'
+            }), 416
+        
+        expected = request.headers.get('X-Chunk-SHA256') or request.args.get('checksum')
+        
+        # Lê o corpo diretamente do stream, sem passar por form/multipart
+        try:
+            checksum = upload.write_chunk(offset, request.stream, length, expected=expected)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 422
+        
+        return jsonify({
+            'success': True,
+            'offset': offset,
+            'length': length,
+            'checksum': checksum,
+            'received': upload.received,
+            'complete': upload.complete
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao receber parte do upload: {str(e)}'
+        }), 500
+
+@files_bp.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Retorna o progresso de um upload em partes"""
+    upload = get_chunked_upload(upload_id)
+    if upload is None:
+        return jsonify({
+            'success': False,
+            'message': 'Upload não encontrado'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        **upload.status()
+    })
+
+@files_bp.route('/upload/<upload_id>/finalize', methods=['POST'])
+def upload_finalize(upload_id):
+    """Conclui um upload em partes, movendo o arquivo para o destino"""
+    try:
+        upload = get_chunked_upload(upload_id)
+        if upload is None:
+            return jsonify({
+                'success': False,
+                'message': 'Upload não encontrado'
+            }), 404
+        
+        try:
+            upload.finalize()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e),
+                **upload.status()
+            }), 409
+        
+        with chunked_uploads_lock:
+            chunked_uploads.pop(upload_id, None)
+        invalidate_listing(upload.dest_path)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Arquivo enviado com sucesso',
+            'path': os.path.relpath(upload.dest_path, BASE_DIR),
+            'filename': os.path.basename(upload.dest_path)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao concluir upload: {str(e)}'
+        }), 500
+
+@files_bp.route('/upload/<upload_id>', methods=['DELETE'])
+def upload_abort(upload_id):
+    """Cancela um upload em partes"""
+    with chunked_uploads_lock:
+        upload = chunked_uploads.pop(upload_id, None)
+    if upload is None:
+        return jsonify({
+            'success': False,
+            'message': 'Upload não encontrado'
+        }), 404
+    
+    upload.abort()
+    return jsonify({
+        'success': True,
+        'message': 'Upload cancelado'
+    })
+
+def archive_options(source):
+    """Formato, nível de compressão e pastas ignoradas pedidos pelo cliente"""
+    fmt = source.get('format', 'zip')
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Formato inválido (use {', '.join(ARCHIVE_FORMATS)})")
+    level = int(source.get('level', ARCHIVE_DEFAULT_LEVEL))
+    if not 0 <= level <= 9:
+        raise ValueError('Nível de compressão deve estar entre 0 e 9')
+    exclude = source.get('exclude') or ()
+    if isinstance(exclude, str):
+        exclude = [name.strip() for name in exclude.split(',') if name.strip()]
+    return fmt, level, tuple(exclude)
+
+def download_archive(full_path):
+    """Envia um diretório compactado, gerado em stream (sem arquivo temporário)"""
+    try:
+        fmt, level, exclude = archive_options(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+    response = Response(
+        stream_with_context(archive_stream(full_path, fmt, level, exclude)),
+        mimetype=ARCHIVE_MIMETYPES[fmt]
+    )
+    # O tamanho final não é conhecido: a resposta vai em chunked transfer
+    set_attachment(response, archive_name(full_path, fmt))
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.cache_control.no_store = True
+    return response
+
+def set_attachment(response, filename):
+    """``Content-Disposition`` como o ``send_file``: nomes com acentos vão em ``filename*`` (RFC 5987)"""
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+
 @files_bp.route('/download', methods=['GET'])
 def download_file():
-    """Faz download de um arquivo"""
+    """Faz download de um arquivo (diretórios são enviados como zip/tar.gz)"""
     try:
         path = request.args.get('path')
         if not path:
@@ -275,12 +1218,10 @@ def download_file():
             }), 404
         
         if os.path.isdir(full_path):
-            return jsonify({
-                'success': False,
-                'message': 'Caminho é um diretório'
-            }), 400
+            return download_archive(full_path)
         
-        return send_file(full_path, as_attachment=True)
+        # send_file responde 304 (If-None-Match/If-Modified-Since) e 206 (Range/If-Range)
+        return send_file(full_path, as_attachment=True, etag=file_etag(full_path), conditional=True)
         
     except Exception as e:
         return jsonify({
@@ -326,6 +1267,7 @@ def delete_file():
             shutil.rmtree(full_path)
         else:
             os.remove(full_path)
+        invalidate_listing(full_path)
         
         return jsonify({
             'success': True,
@@ -367,6 +1309,7 @@ def create_folder():
             }), 400
         
         os.makedirs(full_path)
+        invalidate_listing(full_path)
         
         return jsonify({
             'success': True,
@@ -380,3 +1323,56 @@ def create_folder():
             'message': f'Erro ao criar diretório: {str(e)}'
         }), 500
 
+
+@files_bp.route('/archive', methods=['POST'])
+def create_archive():
+    """Salva um diretório compactado em ``backups/`` usando o mesmo gerador do download"""
+    try:
+        data = request.get_json() or {}
+        path = data.get('path', '')
+
+        full_path = os.path.join(BASE_DIR, path.lstrip('/'))
+
+        if not is_safe_path(full_path):
+            return jsonify({
+                'success': False,
+                'message': 'Caminho não permitido'
+            }), 403
+
+        if not os.path.isdir(full_path):
+            return jsonify({
+                'success': False,
+                'message': 'Diretório não encontrado'
+            }), 404
+
+        try:
+            fmt, level, exclude = archive_options(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        name = archive_name(full_path, fmt)
+        base, ext = name[:-len(ARCHIVE_FORMATS[fmt])], ARCHIVE_FORMATS[fmt]
+        backup_path = os.path.join(BACKUP_DIR, f'{base}-{stamp}{ext}')
+
+        started = time.time()
+        digest = atomic_write(backup_path, archive_stream(full_path, fmt, level, exclude))
+
+        return jsonify({
+            'success': True,
+            'message': 'Backup criado com sucesso',
+            'file': os.path.basename(backup_path),
+            'size': os.path.getsize(backup_path),
+            'sha256': digest,
+            'elapsed': round(time.time() - started, 3)
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao criar backup: {str(e)}'
+        }), 500
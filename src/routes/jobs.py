@@ -0,0 +1,398 @@
+import os
+import json
+import codecs
+import selectors
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+jobs_bp = Blueprint('jobs', __name__)
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))   # comandos executando ao mesmo tempo
+JOB_QUEUE_MAX = 32             # comandos aguardando um worker
+JOB_HISTORY = 100              # jobs finalizados mantidos para consulta
+JOB_OUTPUT_MAX = 1024 * 1024   # saída guardada por job (as partes mais antigas são descartadas)
+JOB_DEFAULT_TIMEOUT = 600
+JOB_MAX_TIMEOUT = 3600
+JOB_CANCEL_GRACE = 3           # segundos entre SIGTERM e SIGKILL
+JOB_DEFAULT_CWD = '/home/ubuntu'
+JOB_FINAL_STATES = ('finished', 'failed', 'timeout', 'cancelled')
+
+class JobQueueFull(Exception):
+    """Fila de comandos cheia"""
+
+class Job:
+    """Um comando shell e sua saída (stdout/stderr em partes numeradas por offset)"""
+
+    def __init__(self, command, cwd=JOB_DEFAULT_CWD, timeout=JOB_DEFAULT_TIMEOUT):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.cwd = cwd
+        self.timeout = timeout
+        self.status = 'queued'
+        self.return_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.cancel_requested = False
+        self.chunks = deque()      # (offset, stream, texto)
+        self.output_bytes = 0      # tamanho atual de ``chunks``
+        self.total = 0             # offset do fim da saída (inclui o que foi descartado)
+        self.cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in JOB_FINAL_STATES
+
+    def append(self, stream, text):
+        if not text:
+            return
+        size = len(text.encode('utf-8'))
+        with self.cond:
+            self.chunks.append((self.total, stream, text))
+            self.total += size
+            self.output_bytes += size
+            while self.output_bytes > JOB_OUTPUT_MAX and len(self.chunks) > 1:
+                _, _, old = self.chunks.popleft()
+                self.output_bytes -= len(old.encode('utf-8'))
+            self.cond.notify_all()
+
+    def output_since(self, offset=0):
+        """Partes com offset >= ``offset``; retorna ``(partes, truncado, fim)``"""
+        with self.cond:
+            chunks = [c for c in self.chunks if c[0] >= offset]
+            first = self.chunks[0][0] if self.chunks else self.total
+            return chunks, offset < first, self.total
+
+    def set_status(self, status, **fields):
+        with self.cond:
+            self.status = status
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.cond.notify_all()
+
+    def wait(self, offset, timeout):
+        """Bloqueia até haver saída depois de ``offset`` ou o job terminar"""
+        with self.cond:
+            if self.total > offset or self.done:
+                return
+            self.cond.wait(timeout)
+
+    def wait_done(self, timeout):
+        """Bloqueia até o job terminar; retorna se terminou"""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.done, timeout)
+
+    def to_dict(self, output=False):
+        data = {
+            'job_id': self.id,
+            'command': self.command,
+            'cwd': self.cwd,
+            'status': self.status,
+            'return_code': self.return_code,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'output_size': self.total,
+            'pid': self.process.pid if self.process and not self.done else None
+        }
+        if output:
+            chunks, truncated, _ = self.output_since(0)
+            data['output'] = ''.join(text for _, stream, text in chunks if stream == 'stdout')
+            data['stderr'] = ''.join(text for _, stream, text in chunks if stream == 'stderr')
+            data['truncated'] = truncated
+        return data
+
+class JobRunner:
+    """Pool limitado de workers que executa comandos fora das threads das requisições.
+
+    ``submit`` só enfileira; até ``JOB_WORKERS`` threads (criadas sob
+    demanda) executam os comandos, cada uma lendo stdout e stderr do seu
+    processo com um ``selector``. A saída de cada job é limitada a
+    ``JOB_OUTPUT_MAX`` bytes e os jobs finalizados ficam no histórico até
+    serem empurrados pelos ``JOB_HISTORY`` mais recentes.
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.max_workers = workers
+        self.jobs = OrderedDict()
+        self.pending = deque()
+        self.workers = 0
+        self.idle = 0
+        self.starting = 0   # workers criados que ainda não pegaram a trava
+        self.cond = threading.Condition()
+
+    def submit(self, command, cwd=JOB_DEFAULT_CWD, timeout=JOB_DEFAULT_TIMEOUT):
+        job = Job(command, cwd=cwd, timeout=max(1, min(timeout, JOB_MAX_TIMEOUT)))
+        with self.cond:
+            if len(self.pending) >= JOB_QUEUE_MAX:
+                raise JobQueueFull()
+            self.jobs[job.id] = job
+            self.pending.append(job)
+            self._trim_history()
+            # Um worker ocioso atende um só job: cria outros enquanto a fila for maior que os ociosos
+            while self.idle + self.starting < len(self.pending) and self.workers < self.max_workers:
+                self.workers += 1
+                self.starting += 1
+                thread = threading.Thread(target=self._worker)
+                thread.daemon = True
+                thread.start()
+            self.cond.notify()
+        return job
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.cond:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.cond:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """Cancela um job na fila ou sinaliza o processo em execução; retorna o job"""
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.done:
+                return job
+            job.cancel_requested = True
+            if job in self.pending:
+                self.pending.remove(job)
+                job.set_status('cancelled', finished_at=time.time())
+                return job
+        self._signal(job, signal.SIGTERM)
+        return job
+
+    def stats(self):
+        with self.cond:
+            return {
+                'workers': self.workers,
+                'max_workers': self.max_workers,
+                'queued': len(self.pending),
+                'running': sum(1 for job in self.jobs.values() if job.status == 'running')
+            }
+
+    def _signal(self, job, sig):
+        # Sinaliza o grupo inteiro enquanto o job não termina: o shell pode já
+        # ter saído deixando filhos em segundo plano com os pipes abertos
+        process = job.process
+        if process is None or job.done:
+            return
+        try:
+            os.killpg(process.pid, sig)
+        except OSError:
+            pass
+
+    def _worker(self):
+        starting = True
+        while True:
+            with self.cond:
+                if starting:
+                    self.starting -= 1
+                    starting = False
+                self.idle += 1
+                while not self.pending:
+                    if not self.cond.wait(timeout=60):
+                        # Ocioso por um minuto: libera a thread
+                        self.idle -= 1
+                        self.workers -= 1
+                        return
+                self.idle -= 1
+                job = self.pending.popleft()
+            try:
+                self._run(job)
+            except Exception as e:
+                job.set_status('failed', error=str(e), finished_at=time.time())
+
+    def _run(self, job):
+        process = subprocess.Popen(
+            job.command,
+            shell=True,
+            cwd=job.cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True
+        )
+        job.process = process
+        job.set_status('running', started_at=time.time())
+
+        deadline = job.started_at + job.timeout
+        state = {'kill_at': None, 'killed': False, 'timed_out': False}
+
+        def enforce_limits():
+            """Aplica o timeout e o cancelamento (SIGTERM e, após a carência, SIGKILL)"""
+            now = time.time()
+            if not state['timed_out'] and now >= deadline:
+                state['timed_out'] = True
+                self._signal(job, signal.SIGTERM)
+                state['kill_at'] = now + JOB_CANCEL_GRACE
+            if job.cancel_requested and state['kill_at'] is None:
+                self._signal(job, signal.SIGTERM)
+                state['kill_at'] = now + JOB_CANCEL_GRACE
+            if state['kill_at'] is not None and now >= state['kill_at'] and not state['killed']:
+                state['killed'] = True
+                self._signal(job, signal.SIGKILL)
+
+        decoders = {}
+        selector = selectors.DefaultSelector()
+        for name, pipe in (('stdout', process.stdout), ('stderr', process.stderr)):
+            os.set_blocking(pipe.fileno(), False)
+            selector.register(pipe, selectors.EVENT_READ, name)
+            decoders[name] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        try:
+            while selector.get_map():
+                enforce_limits()
+                for key, _ in selector.select(timeout=0.5):
+                    try:
+                        data = os.read(key.fileobj.fileno(), 65536)
+                    except BlockingIOError:
+                        continue
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        job.append(key.data, decoders[key.data].decode(b'', final=True))
+                        continue
+                    job.append(key.data, decoders[key.data].decode(data))
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
+
+        # O comando pode fechar stdout/stderr e continuar rodando
+        # (ex.: ``exec >/dev/null 2>&1; sleep 60``): os limites continuam valendo
+        while True:
+            enforce_limits()
+            try:
+                return_code = process.wait(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+
+        if job.cancel_requested:
+            status = 'cancelled'
+        elif state['timed_out']:
+            status = 'timeout'
+        else:
+            status = 'finished'
+        job.set_status(status, return_code=return_code, finished_at=time.time())
+
+# Pool compartilhado pelas rotas de comandos
+job_runner = JobRunner()
+
+def job_not_found():
+    return jsonify({
+        'success': False,
+        'message': 'Job não encontrado'
+    }), 404
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """Enfileira um comando e retorna imediatamente o id do job"""
+    try:
+        data = request.get_json(silent=True) or {}
+        command = data.get('command', '').strip()
+        if not command:
+            return jsonify({
+                'success': False,
+                'message': 'Comando não fornecido'
+            }), 400
+
+        job = job_runner.submit(
+            command,
+            cwd=data.get('cwd') or JOB_DEFAULT_CWD,
+            timeout=int(data.get('timeout', JOB_DEFAULT_TIMEOUT))
+        )
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        }), 202
+
+    except JobQueueFull:
+        return jsonify({
+            'success': False,
+            'message': 'Muitos comandos na fila, tente novamente em instantes'
+        }), 429
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao enfileirar comando: {str(e)}'
+        }), 500
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """Histórico de jobs (mais recentes primeiro)"""
+    return jsonify({
+        'success': True,
+        'jobs': [job.to_dict() for job in reversed(job_runner.list())],
+        **job_runner.stats()
+    })
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status do job e a saída a partir de ``since`` (offset em bytes)"""
+    job = job_runner.get(job_id)
+    if job is None:
+        return job_not_found()
+
+    since = max(0, request.args.get('since', 0, type=int))
+    chunks, truncated, end = job.output_since(since)
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'chunks': [{'offset': offset, 'stream': stream, 'data': text} for offset, stream, text in chunks],
+        'truncated': truncated,
+        'next': end
+    })
+
+@jobs_bp.route('/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """Saída do job em tempo real (NDJSON), terminando com o status final"""
+    job = job_runner.get(job_id)
+    if job is None:
+        return job_not_found()
+
+    since = max(0, request.args.get('since', 0, type=int))
+
+    def generate():
+        offset = since
+        while True:
+            job.wait(offset, timeout=15)
+            chunks, truncated, end = job.output_since(offset)
+            if truncated:
+                yield json.dumps({'truncated': True, 'offset': offset}) + '\n'
+            for chunk_offset, stream, text in chunks:
+                yield json.dumps({'offset': chunk_offset, 'stream': stream, 'data': text}, ensure_ascii=False) + '\n'
+            offset = end
+            if job.done and job.total <= offset:
+                yield json.dumps({'status': job.status, 'return_code': job.return_code, 'next': offset}) + '\n'
+                return
+            if not chunks:
+                # Mantém a conexão viva em comandos silenciosos
+                yield json.dumps({'heartbeat': time.time()}) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancela o job (SIGTERM no grupo do processo, SIGKILL após alguns segundos)"""
+    job = job_runner.cancel(job_id)
+    if job is None:
+        return job_not_found()
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
@@ -0,0 +1,227 @@
+import os
+import bisect
+import threading
+import time
+from functools import wraps
+from flask import Blueprint, Response, g, request
+import psutil
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# PANEL_METRICS=0 desliga a instrumentação (ex.: para medir o custo dela com o benchmark)
+METRICS_ENABLED = os.environ.get('PANEL_METRICS', '1') != '0'
+
+# Limites (em segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Eventos tratados pelo gauge de conexões em vez do histograma
+SOCKET_LIFECYCLE_EVENTS = ('connect', 'disconnect')
+
+class Series:
+    """Contagem por status e histograma de latência de uma rota ou evento"""
+
+    __slots__ = ('buckets', 'total', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # não cumulativos; o último é +Inf
+        self.total = 0.0
+        self.statuses = {}
+
+class MetricsRegistry:
+    """Métricas do painel no formato de texto do Prometheus.
+
+    O caminho quente (``observe``) calcula o bucket fora da trava e a segura
+    só para incrementar três contadores; os histogramas cumulativos e os
+    gauges são montados apenas quando ``/metrics`` é consultado. Gauges são
+    funções chamadas na coleta, então não custam nada entre uma coleta e
+    outra.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}    # (família, rótulos) -> Series
+        self.gauges = []    # (nome, ajuda, função)
+        self.monitors = {}  # nome -> objeto com atributo ``thread``
+
+    def observe(self, family, labels, status, duration):
+        index = bisect.bisect_left(LATENCY_BUCKETS, duration)
+        key = (family, labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series()
+            series.buckets[index] += 1
+            series.total += duration
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+
+    def gauge(self, name, help_text, collect):
+        """Registra um gauge; ``collect`` devolve um número ou ``{rótulos: valor}``"""
+        self.gauges.append((name, help_text, collect))
+
+    def monitor(self, name, service):
+        """Registra um serviço de fundo cuja ``thread`` aparece em ``panel_monitor_thread_running``"""
+        self.monitors[name] = service
+
+    def snapshot(self):
+        with self.lock:
+            return [(family, labels, list(s.buckets), s.total, dict(s.statuses))
+                    for (family, labels), s in self.series.items()]
+
+    def render(self):
+        lines = []
+        by_family = {}
+        for family, labels, buckets, total, statuses in self.snapshot():
+            by_family.setdefault(family, []).append((labels, buckets, total, statuses))
+
+        for family, (count_name, count_help, hist_name, hist_help, label_names) in FAMILIES.items():
+            entries = sorted(by_family.get(family, []))
+            lines.append(f'# HELP {count_name} {count_help}')
+            lines.append(f'# TYPE {count_name} counter')
+            for labels, _, _, statuses in entries:
+                base = list(zip(label_names, labels))
+                for status, count in sorted(statuses.items(), key=lambda item: str(item[0])):
+                    lines.append(f"{count_name}{format_labels(base + [('status', status)])} {count}")
+
+            lines.append(f'# HELP {hist_name} {hist_help}')
+            lines.append(f'# TYPE {hist_name} histogram')
+            for labels, buckets, total, _ in entries:
+                base = list(zip(label_names, labels))
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                    cumulative += count
+                    lines.append(f"{hist_name}_bucket{format_labels(base + [('le', bound)])} {cumulative}")
+                lines.append(f'{hist_name}_sum{format_labels(base)} {total:.6f}')
+                lines.append(f'{hist_name}_count{format_labels(base)} {cumulative}')
+
+        for name, help_text, collect in self.gauges:
+            try:
+                value = collect()
+            except Exception as e:
+                print(f"Erro ao coletar a métrica {name}: {e}")
+                continue
+            if value is None:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            if isinstance(value, dict):
+                for labels, sample in sorted(value.items()):
+                    lines.append(f'{name}{format_labels(labels)} {format_value(sample)}')
+            else:
+                lines.append(f'{name} {format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+# família -> (contador, ajuda, histograma, ajuda, nomes dos rótulos)
+FAMILIES = {
+    'http': ('panel_http_requests_total', 'Requisições HTTP por rota, método e status.',
+             'panel_http_request_duration_seconds', 'Tempo até a resposta (cabeçalhos) por rota e método.',
+             ('method', 'route')),
+    'socketio': ('panel_socketio_events_total', 'Eventos Socket.IO recebidos por evento e resultado.',
+                 'panel_socketio_event_duration_seconds', 'Tempo de execução do handler por evento.',
+                 ('event',))
+}
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+def format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+registry = MetricsRegistry()
+
+def instrument_app(app):
+    """Mede cada requisição HTTP pela regra da rota (ex.: ``/api/files/list``)"""
+    if not METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            registry.observe('http', (request.method, rule), response.status_code,
+                             time.perf_counter() - start)
+        return response
+
+def timed_handler(event, handler):
+    @wraps(handler)
+    def wrapper(*args):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            result = handler(*args)
+            status = 'ok'
+            return result
+        finally:
+            registry.observe('socketio', (event,), status, time.perf_counter() - start)
+    return wrapper
+
+def instrument_socketio(socketio, namespace='/'):
+    """Envolve os handlers já registrados; chamar depois de ``register_socket_events``"""
+    if not METRICS_ENABLED:
+        return
+    handlers = socketio.server.handlers.get(namespace, {})
+    for event, handler in list(handlers.items()):
+        if event not in SOCKET_LIFECYCLE_EVENTS:
+            handlers[event] = timed_handler(event, handler)
+
+def register_default_gauges(socketio):
+    """Gauges do estado do painel, calculados apenas na coleta"""
+    from src.routes.bot import get_bot_status, config_store, bot_log_store
+    from src.routes.terminal import terminal_sessions, pty_reactor
+    from src.routes.jobs import job_runner
+    from src.routes.system import metrics_sampler
+    from src.routes.backup import backup_scheduler
+    from src.fs_watcher import directory_watcher
+
+    registry.monitor('metrics_sampler', metrics_sampler)
+    registry.monitor('pty_reactor', pty_reactor)
+    registry.monitor('directory_watcher', directory_watcher)
+    registry.monitor('config_watcher', config_store)
+    registry.monitor('backup_scheduler', backup_scheduler)
+    registry.monitor('bot_log_compressor', bot_log_store)
+
+    process = psutil.Process()
+
+    registry.gauge('panel_socketio_connections', 'Conexões Engine.IO abertas neste processo.',
+                   lambda: len(socketio.server.eio.sockets))
+    registry.gauge('panel_terminal_sessions', 'Sessões de terminal ativas.',
+                   lambda: sum(1 for session in list(terminal_sessions.values()) if session.active))
+    registry.gauge('panel_monitor_thread_running', 'Threads de fundo do painel em execução (1) ou paradas (0).',
+                   lambda: {(('monitor', name),): bool(service.thread is not None and service.thread.is_alive())
+                            for name, service in registry.monitors.items()})
+
+    def bot_state():
+        status = get_bot_status()
+        return {(('state', state),): state == status
+                for state in sorted({'running', 'starting', 'stopping', 'stopped', 'error', status})}
+
+    registry.gauge('panel_bot_up', 'Bot em execução (1) ou não (0).', lambda: get_bot_status() == 'running')
+    registry.gauge('panel_bot_state', 'Estado atual do bot (1 no estado corrente).', bot_state)
+    registry.gauge('panel_jobs', 'Comandos do pool de jobs por situação.',
+                   lambda: {(('state', key),): value for key, value in job_runner.stats().items()
+                            if key in ('queued', 'running')})
+    registry.gauge('panel_threads', 'Threads do processo do painel.', threading.active_count)
+    registry.gauge('process_resident_memory_bytes', 'Memória residente do processo do painel.',
+                   lambda: process.memory_info().rss)
+    registry.gauge('process_cpu_seconds_total', 'Tempo de CPU (usuário + sistema) do processo do painel.',
+                   lambda: round(sum(process.cpu_times()[:2]), 3))
+    registry.gauge('process_open_fds', 'Descritores de arquivo abertos pelo painel.', process.num_fds)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas no formato de exposição de texto do Prometheus"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
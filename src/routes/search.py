@@ -0,0 +1,322 @@
+import os
+import json
+import fnmatch
+import sqlite3
+import threading
+import time
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from src.routes.files import BASE_DIR, is_safe_path
+
+search_bp = Blueprint('search', __name__)
+
+# Índice persistente (SQLite FTS5 com tokenizador de trigramas)
+SEARCH_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'search_index.db')
+SEARCH_SKIP_DIRS = {'node_modules', '.git', '__pycache__', '.cache', '.npm'}
+SEARCH_MAX_FILE_SIZE = 1024 * 1024     # conteúdo de arquivos maiores não é indexado
+SEARCH_REFRESH_INTERVAL = 30           # segundos entre varreduras de mtime
+SEARCH_BATCH_SIZE = 200
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+SEARCH_MAX_LINE_MATCHES = 5
+
+class SearchIndex:
+    """Índice de nomes e conteúdo dos arquivos de ``BASE_DIR``.
+
+    Os nomes ficam na tabela ``files`` e o texto numa tabela FTS5 com
+    trigramas, o que permite buscar qualquer trecho com 3+ caracteres sem
+    ler os arquivos. A atualização é incremental: uma varredura compara
+    mtime e tamanho com o que está no banco e só reindexa o que mudou.
+    Diretórios como ``node_modules`` e arquivos binários são ignorados.
+
+    Se o SQLite não tiver FTS5 com trigramas (anterior à 3.34), o texto vai
+    para uma tabela comum e toda busca de conteúdo usa a varredura com LIKE.
+    """
+
+    def __init__(self, db_path=SEARCH_DB_PATH, root=BASE_DIR):
+        self.db_path = db_path
+        self.root = root
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.ready = threading.Event()   # primeira indexação concluída
+        self.refreshing = False
+        self.last_refresh = 0
+        self.fts = True
+        self._init_db()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    name TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    has_content INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            try:
+                conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS content
+                    USING fts5(body, tokenize='trigram')
+                ''')
+            except sqlite3.OperationalError as e:
+                print(f"Índice de busca sem FTS5 ({e}); usando varredura do texto")
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS content (
+                        id INTEGER PRIMARY KEY,
+                        body TEXT NOT NULL
+                    )
+                ''')
+            sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'content'").fetchone()[0]
+            self.fts = 'fts5' in sql.lower()
+
+    def _walk(self):
+        """Percorre a árvore gerando ``(caminho relativo, stat)`` dos arquivos"""
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.name.startswith('.'):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in SEARCH_SKIP_DIRS:
+                                    stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                rel_path = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                                yield rel_path, entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def _read_text(self, rel_path, size):
+        """Conteúdo textual do arquivo, ou None se for grande demais ou binário"""
+        if size > SEARCH_MAX_FILE_SIZE:
+            return None
+        try:
+            with open(os.path.join(self.root, rel_path), 'rb') as f:
+                data = f.read(SEARCH_MAX_FILE_SIZE + 1)
+        except OSError:
+            return None
+        if b'\0' in data[:8192]:
+            return None
+        return data.decode('utf-8', errors='replace')
+
+    def refresh(self):
+        """Varre a árvore e atualiza apenas os arquivos novos, alterados ou removidos"""
+        with self.lock:
+            if self.refreshing:
+                return False
+            self.refreshing = True
+
+        try:
+            conn = self.connect()
+            try:
+                known = {
+                    path: (file_id, mtime_ns, size)
+                    for file_id, path, mtime_ns, size in conn.execute(
+                        'SELECT id, path, mtime_ns, size FROM files')
+                }
+                pending = 0
+                for rel_path, stat in self._walk():
+                    current = known.pop(rel_path, None)
+                    if current and current[1] == stat.st_mtime_ns and current[2] == stat.st_size:
+                        continue
+
+                    text = self._read_text(rel_path, stat.st_size)
+                    if current:
+                        file_id = current[0]
+                        conn.execute('DELETE FROM content WHERE rowid = ?', (file_id,))
+                        conn.execute(
+                            'UPDATE files SET mtime_ns = ?, size = ?, has_content = ? WHERE id = ?',
+                            (stat.st_mtime_ns, stat.st_size, text is not None, file_id))
+                    else:
+                        file_id = conn.execute(
+                            'INSERT INTO files (path, name, mtime_ns, size, has_content) VALUES (?, ?, ?, ?, ?)',
+                            (rel_path, os.path.basename(rel_path), stat.st_mtime_ns, stat.st_size,
+                             text is not None)).lastrowid
+                    if text is not None:
+                        conn.execute('INSERT INTO content (rowid, body) VALUES (?, ?)', (file_id, text))
+
+                    pending += 1
+                    if pending >= SEARCH_BATCH_SIZE:
+                        conn.commit()
+                        pending = 0
+
+                # O que sobrou em ``known`` não existe mais no disco
+                for file_id, _, _ in known.values():
+                    conn.execute('DELETE FROM content WHERE rowid = ?', (file_id,))
+                    conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+                conn.commit()
+            finally:
+                conn.close()
+        finally:
+            with self.lock:
+                self.refreshing = False
+                self.last_refresh = time.time()
+        return True
+
+    def ensure_fresh(self):
+        """Atualiza o índice se estiver velho: de forma síncrona na primeira vez, depois em segundo plano"""
+        if not self.ready.is_set():
+            # Buscas simultâneas na primeira vez esperam a mesma indexação
+            with self.build_lock:
+                if not self.ready.is_set():
+                    self.refresh()
+                    self.ready.set()
+        elif time.time() - self.last_refresh > SEARCH_REFRESH_INTERVAL and not self.refreshing:
+            thread = threading.Thread(target=self.refresh)
+            thread.daemon = True
+            thread.start()
+
+    def search_names(self, pattern, prefix='', limit=SEARCH_DEFAULT_LIMIT):
+        """Arquivos cujo nome (ou caminho, se o padrão tiver '/') casa com o glob"""
+        match_path = '/' in pattern
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT path, name, size, mtime_ns FROM files WHERE path LIKE ? ESCAPE '\\' ORDER BY length(path), path",
+                (escape_like(prefix) + '%',))
+            for path, name, size, mtime_ns in rows:
+                target = path if match_path else name
+                if fnmatch.fnmatch(target.lower(), pattern.lower()):
+                    yield {'path': path, 'name': name, 'size': size, 'modified': mtime_ns / 1e9}
+                    limit -= 1
+                    if limit <= 0:
+                        return
+        finally:
+            conn.close()
+
+    def search_content(self, query, prefix='', pattern=None, limit=SEARCH_DEFAULT_LIMIT):
+        """Arquivos que contêm ``query``, do mais relevante (bm25) ao menos relevante"""
+        conn = self.connect()
+        try:
+            if self.fts and len(query) >= 3:
+                rows = conn.execute('''
+                    SELECT files.path, files.name, files.size, files.mtime_ns, bm25(content) AS rank
+                    FROM content JOIN files ON files.id = content.rowid
+                    WHERE content MATCH ? AND files.path LIKE ? ESCAPE '\\'
+                    ORDER BY rank
+                ''', ('"' + query.replace('"', '""') + '"', escape_like(prefix) + '%'))
+            else:
+                # Trigramas exigem 3 caracteres (e FTS5): consultas curtas varrem o texto
+                rows = conn.execute('''
+                    SELECT files.path, files.name, files.size, files.mtime_ns, 0 AS rank
+                    FROM content JOIN files ON files.id = content.rowid
+                    WHERE content.body LIKE ? ESCAPE '\\' AND files.path LIKE ? ESCAPE '\\'
+                ''', ('%' + escape_like(query) + '%', escape_like(prefix) + '%'))
+
+            for path, name, size, mtime_ns, rank in rows:
+                if pattern and not fnmatch.fnmatch(name.lower(), pattern.lower()):
+                    continue
+                matches = self._line_matches(path, query)
+                if not matches:
+                    continue
+                yield {
+                    'path': path,
+                    'name': name,
+                    'size': size,
+                    'modified': mtime_ns / 1e9,
+                    'score': round(-rank, 4),
+                    'matches': matches
+                }
+                limit -= 1
+                if limit <= 0:
+                    return
+        finally:
+            conn.close()
+
+    def _line_matches(self, rel_path, query):
+        """Linhas do arquivo que contêm ``query`` (lidas do disco, já que o índice pode estar defasado)"""
+        needle = query.lower()
+        matches = []
+        try:
+            with open(os.path.join(self.root, rel_path), 'r', encoding='utf-8', errors='replace') as f:
+                for number, line in enumerate(f, 1):
+                    if needle in line.lower():
+                        matches.append({'line': number, 'text': line.rstrip('\r\n')[:300]})
+                        if len(matches) >= SEARCH_MAX_LINE_MATCHES:
+                            break
+        except OSError:
+            pass
+        return matches
+
+def escape_like(value):
+    """Escapa curingas do LIKE do SQLite"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Índice compartilhado (criado no primeiro uso)
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def get_search_index():
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex()
+        return _search_index
+
+@search_bp.route('/search', methods=['GET'])
+def search_files():
+    """Busca arquivos por nome (glob) e/ou conteúdo"""
+    try:
+        query = request.args.get('q', '').strip()
+        pattern = request.args.get('name', '').strip()
+        path = request.args.get('path', '').strip('/')
+        limit = request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        stream = request.args.get('stream') in ('1', 'true')
+
+        if not query and not pattern:
+            return jsonify({
+                'success': False,
+                'message': 'Informe o texto (q) ou o padrão de nome (name)'
+            }), 400
+
+        if not is_safe_path(os.path.join(BASE_DIR, path)):
+            return jsonify({
+                'success': False,
+                'message': 'Caminho não permitido'
+            }), 403
+
+        index = get_search_index()
+        index.ensure_fresh()
+        prefix = f'{path}/' if path else ''
+
+        if query:
+            results = index.search_content(query, prefix=prefix, pattern=pattern or None, limit=limit)
+        else:
+            results = index.search_names(pattern, prefix=prefix, limit=limit)
+
+        if stream:
+            # Um resultado JSON por linha, enviado assim que encontrado
+            def generate():
+                for result in results:
+                    yield json.dumps(result, ensure_ascii=False) + '\n'
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        items = list(results)
+        return jsonify({
+            'success': True,
+            'results': items,
+            'total': len(items),
+            'indexed_at': index.last_refresh
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao buscar arquivos: {str(e)}'
+        }), 500
@@ -1,9 +1,252 @@
-from flask_socketio import emit, disconnect
+from collections import deque
+from flask import request
+from flask_socketio import emit, disconnect, join_room, leave_room
 import threading
 import time
 
+# Parâmetros do envio de logs do bot em tempo real
+LOG_BATCH_INTERVAL = 0.2      # segundos entre lotes para cada cliente
+LOG_BATCH_LINES = 500         # máximo de linhas por lote
+LOG_SUBSCRIBER_QUEUE = 5000   # linhas pendentes por cliente antes de descartar
+LOG_ACK_TIMEOUT = 10          # segundos aguardando confirmação de um lote
+LOG_READ_CHUNK = 5000         # linhas lidas do buffer por iteração
+
+class LogSubscriber:
+    """Estado de um cliente inscrito nos logs do bot"""
+
+    def __init__(self, sid, ack=False):
+        self.sid = sid
+        self.ack = ack
+        self.queue = deque(maxlen=LOG_SUBSCRIBER_QUEUE)
+        self.skipped = 0
+        self.awaiting_ack = False
+        self.sent_at = 0
+        self.last_flush = 0
+
+    def push(self, lines):
+        """Enfileira linhas, contando as que forem descartadas por excesso"""
+        overflow = len(self.queue) + len(lines) - LOG_SUBSCRIBER_QUEUE
+        if overflow > 0:
+            self.skipped += overflow
+        self.queue.extend(lines)
+
+class LogTailer:
+    """Distribui as linhas novas do buffer de logs para os clientes inscritos.
+
+    Uma única thread acompanha o buffer e agrupa as linhas em lotes (a cada
+    ``LOG_BATCH_INTERVAL`` ou ``LOG_BATCH_LINES``). Cada cliente tem uma fila
+    limitada; quando ela enche, as linhas mais antigas são descartadas e o
+    próximo lote leva um aviso com a quantidade ignorada. Clientes que pedem
+    ``ack`` só recebem um novo lote depois de confirmar o anterior.
+    """
+
+    def __init__(self, socketio, buffer):
+        self.socketio = socketio
+        self.buffer = buffer
+        self.subscribers = {}
+        self.cursor = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def subscribe(self, sid, since=None, ack=False):
+        """Inscreve um cliente; ``since`` reenvia as linhas já existentes após esse seq"""
+        with self.lock:
+            if self.thread is None:
+                self.cursor = self.buffer.last_seq
+            subscriber = LogSubscriber(sid, ack=ack)
+
+            if since is not None and since < self.cursor:
+                start = max(since, self.cursor - LOG_SUBSCRIBER_QUEUE)
+                lines, dropped = self.buffer.read(start, limit=self.cursor - start)
+                subscriber.skipped += (start - since) + dropped
+                subscriber.push(lines)
+
+            self.subscribers[sid] = subscriber
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+            cursor = self.cursor
+
+        self.buffer.wake()
+        return cursor
+
+    def unsubscribe(self, sid):
+        """Remove a inscrição de um cliente"""
+        with self.lock:
+            removed = self.subscribers.pop(sid, None)
+        if removed is not None:
+            self.buffer.wake()
+        return removed is not None
+
+    def _acknowledge(self, subscriber):
+        def callback(*args):
+            subscriber.awaiting_ack = False
+        return callback
+
+    def _collect_batches(self, now):
+        """Monta os lotes prontos para envio (chamado com o lock adquirido)"""
+        batches = []
+        for subscriber in self.subscribers.values():
+            if not subscriber.queue and not subscriber.skipped:
+                continue
+            if subscriber.awaiting_ack and now - subscriber.sent_at < LOG_ACK_TIMEOUT:
+                continue
+            if len(subscriber.queue) < LOG_BATCH_LINES and now - subscriber.last_flush < LOG_BATCH_INTERVAL:
+                continue
+
+            count = min(len(subscriber.queue), LOG_BATCH_LINES)
+            lines = [subscriber.queue.popleft() for _ in range(count)]
+            skipped = subscriber.skipped
+            subscriber.skipped = 0
+            if skipped:
+                lines.insert(0, {
+                    'level': 'warning',
+                    'message': f'[painel] {skipped} linhas ignoradas',
+                    'skipped': skipped
+                })
+
+            subscriber.last_flush = now
+            subscriber.sent_at = now
+            subscriber.awaiting_ack = subscriber.ack
+            batches.append((subscriber, {
+                'lines': lines,
+                'skipped': skipped,
+                'cursor': next((line['seq'] for line in reversed(lines) if 'seq' in line), None)
+            }))
+        return batches
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+                pending = any(sub.queue or sub.skipped for sub in self.subscribers.values())
+                cursor = self.cursor
+
+            # Sem lotes pendentes, dorme até chegar linha nova (sem polling)
+            self.buffer.wait(cursor, timeout=LOG_BATCH_INTERVAL if pending else None)
+            lines, dropped = self.buffer.read(cursor, limit=LOG_READ_CHUNK)
+
+            with self.lock:
+                if lines:
+                    self.cursor = lines[-1]['seq']
+                for subscriber in self.subscribers.values():
+                    subscriber.skipped += dropped
+                    if lines:
+                        subscriber.push(lines)
+                batches = self._collect_batches(time.monotonic())
+
+            for subscriber, payload in batches:
+                try:
+                    if subscriber.ack:
+                        self.socketio.emit('bot_log_batch', payload, to=subscriber.sid,
+                                           callback=self._acknowledge(subscriber))
+                    else:
+                        self.socketio.emit('bot_log_batch', payload, to=subscriber.sid)
+                except Exception as e:
+                    print(f"Erro ao enviar logs para {subscriber.sid}: {e}")
+
+# Intervalo do heartbeat de status enviado mesmo sem mudanças (segundos)
+STATUS_HEARTBEAT = 60
+STATUS_ROOM = 'bot_status'
+
+class StatusBroadcaster:
+    """Transmissor único do status do bot para os clientes inscritos.
+
+    Substitui uma thread de monitoramento por cliente: existe no máximo uma
+    thread, que só roda enquanto houver inscritos. Ela emite
+    ``bot_status_update`` quando o status ou o PID mudam (avisada por
+    ``notify`` a partir de ``bot.py``) e um heartbeat a cada ``STATUS_HEARTBEAT``.
+    """
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.events = deque(maxlen=16)
+        self.thread = None
+        self.last_state = None
+
+    def subscribe(self, sid):
+        """Inscreve um cliente (inscrições repetidas do mesmo cliente contam uma vez)"""
+        with self.lock:
+            self.subscribers.add(sid)
+            if self.thread is None:
+                self.last_state = None
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+            return len(self.subscribers)
+
+    def unsubscribe(self, sid):
+        """Remove a inscrição; a thread termina quando não sobra ninguém"""
+        with self.lock:
+            self.subscribers.discard(sid)
+            remaining = len(self.subscribers)
+        if not remaining:
+            self.wakeup.set()
+        return remaining
+
+    def notify(self, event=None):
+        """Chamado por ``bot.py`` quando o estado do bot muda"""
+        if event:
+            self.events.append(event)
+        self.wakeup.set()
+
+    def _run(self):
+        from src.routes import bot
+
+        last_emit = 0
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+
+            status = bot.get_bot_status()
+            state = (status, bot.bot_supervisor.pid)
+            events = []
+            while self.events:
+                events.append(self.events.popleft())
+
+            now = time.time()
+            if state != self.last_state or events or now - last_emit >= STATUS_HEARTBEAT:
+                payload = {
+                    'status': state[0],
+                    'pid': state[1],
+                    'timestamp': now,
+                    'heartbeat': state == self.last_state and not events
+                }
+                if events:
+                    payload['events'] = events
+                self.socketio.emit('bot_status_update', payload, to=STATUS_ROOM)
+                self.last_state = state
+                last_emit = now
+
+            self.wakeup.wait(timeout=max(0, last_emit + STATUS_HEARTBEAT - time.time()))
+            self.wakeup.clear()
+
 def register_socket_events(socketio):
     """Registra todos os eventos SocketIO"""
+    from src.routes.bot import log_buffer, status_listeners
+    from src.routes import terminal, system, bot
+    from src.routes.metrics import registry
+    from src import fs_watcher, config_store
+    
+    terminal.socketio = socketio
+    system.socketio = socketio
+    fs_watcher.socketio = socketio
+    config_store.socketio = socketio
+    log_tailer = LogTailer(socketio, log_buffer)
+    status_broadcaster = StatusBroadcaster(socketio)
+    status_listeners.append(status_broadcaster.notify)
+    registry.monitor('log_tailer', log_tailer)
+    registry.monitor('status_broadcaster', status_broadcaster)
     
     @socketio.on('connect')
     def handle_connect():
@@ -14,95 +257,197 @@ def register_socket_events(socketio):
     @socketio.on('disconnect')
     def handle_disconnect():
         """Cliente desconectado"""
+        log_tailer.unsubscribe(request.sid)
+        status_broadcaster.unsubscribe(request.sid)
+        fs_watcher.directory_watcher.unwatch_all(request.sid)
+        bot.config_store.unsubscribe(request.sid)
         print('Cliente desconectado')
     
     @socketio.on('join_room')
     def handle_join_room(data):
         """Cliente entra em uma sala"""
         room = data.get('room', 'default')
-        # join_room(room)
+        join_room(room)
         emit('joined_room', {'room': room})
     
     @socketio.on('bot_status_request')
     def handle_bot_status_request():
         """Cliente solicita status do bot"""
-        from src.routes.bot import get_bot_status, bot_process
+        from src.routes.bot import get_bot_status, bot_supervisor
         
         status = get_bot_status()
         emit('bot_status_update', {
             'status': status,
-            'pid': bot_process.pid if bot_process else None
+            'pid': bot_supervisor.pid
         })
     
+    @socketio.on('bot_log_subscribe')
+    def handle_bot_log_subscribe(data=None):
+        """Inscreve o cliente nos logs do bot em tempo real"""
+        data = data or {}
+        since = data.get('since')
+        cursor = log_tailer.subscribe(
+            request.sid,
+            since=int(since) if since is not None else None,
+            ack=bool(data.get('ack', False))
+        )
+        emit('bot_log_subscribed', {
+            'cursor': cursor,
+            'batch_interval': LOG_BATCH_INTERVAL,
+            'batch_lines': LOG_BATCH_LINES
+        })
+    
+    @socketio.on('bot_log_unsubscribe')
+    def handle_bot_log_unsubscribe():
+        """Cancela a inscrição nos logs do bot"""
+        log_tailer.unsubscribe(request.sid)
+        emit('bot_log_unsubscribed', {})
+    
     @socketio.on('terminal_input')
     def handle_terminal_input(data):
         """Recebe input do terminal do cliente"""
+        from src.routes.terminal import terminal_sessions, terminal_room
+        
         session_id = data.get('session_id', 'default')
         input_data = data.get('input', '')
         
-        # Aqui você integraria com o sistema de terminal
-        # Por enquanto, apenas echo
-        emit('terminal_output', {
-            'session_id': session_id,
-            'data': f'Echo: {input_data}\n'
-        })
+        session = terminal_sessions.get(session_id)
+        if session is None:
+            emit('error', {'message': 'Sessão de terminal não encontrada'})
+            return
+        
+        # A saída do PTY é enviada para a sala da sessão
+        join_room(terminal_room(session_id))
+        
+        if input_data and not session.write_input(input_data):
+            emit('error', {'message': 'Erro ao enviar input'})
+    
+    @socketio.on('terminal_attach')
+    def handle_terminal_attach(data):
+        """Reconecta a uma sessão de terminal, reenviando a saída a partir de ``offset``"""
+        from src.routes.terminal import terminal_sessions, terminal_room
+        
+        session_id = data.get('session_id', 'default')
+        offset = int(data.get('offset', 0) or 0)
+        
+        session = terminal_sessions.get(session_id)
+        if session is None or not session.active:
+            emit('error', {'message': 'Sessão de terminal não encontrada'})
+            return
+        
+        # Entrar na sala e copiar o histórico sob o lock garante que nenhum
+        # quadro fique de fora ou seja enviado em dobro
+        with session.lock:
+            join_room(terminal_room(session_id))
+            text, start, end, truncated = session.scrollback_since(offset)
+            emit('terminal_replay', {
+                'session_id': session_id,
+                'data': text,
+                'start': start,
+                'offset': end,
+                'truncated': truncated
+            })
     
     @socketio.on('start_bot_monitoring')
     def handle_start_bot_monitoring():
-        """Inicia monitoramento do bot em tempo real"""
-        def monitor_bot():
-            while True:
-                from src.routes.bot import get_bot_status, bot_process
-                
-                status = get_bot_status()
-                socketio.emit('bot_status_update', {
-                    'status': status,
-                    'pid': bot_process.pid if bot_process else None,
-                    'timestamp': time.time()
-                })
-                
-                time.sleep(5)  # Atualiza a cada 5 segundos
+        """Inscreve o cliente nas atualizações de status do bot"""
+        from src.routes.bot import get_bot_status, bot_supervisor
         
-        # Inicia thread de monitoramento
-        monitor_thread = threading.Thread(target=monitor_bot)
-        monitor_thread.daemon = True
-        monitor_thread.start()
+        join_room(STATUS_ROOM)
+        status_broadcaster.subscribe(request.sid)
         
         emit('monitoring_started', {'message': 'Monitoramento iniciado'})
+        emit('bot_status_update', {
+            'status': get_bot_status(),
+            'pid': bot_supervisor.pid,
+            'timestamp': time.time()
+        })
+    
+    @socketio.on('stop_bot_monitoring')
+    def handle_stop_bot_monitoring():
+        """Cancela as atualizações de status do bot"""
+        leave_room(STATUS_ROOM)
+        status_broadcaster.unsubscribe(request.sid)
+        
+        emit('monitoring_stopped', {'message': 'Monitoramento encerrado'})
     
     @socketio.on('get_system_info')
     def handle_get_system_info():
-        """Retorna informações do sistema"""
-        import psutil
-        import os
+        """Retorna informações do sistema (última amostra do coletor)"""
+        from src.routes.system import metrics_sampler
         
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            system_info = {
-                'cpu_percent': cpu_percent,
-                'memory': {
-                    'total': memory.total,
-                    'available': memory.available,
-                    'percent': memory.percent,
-                    'used': memory.used
-                },
-                'disk': {
-                    'total': disk.total,
-                    'used': disk.used,
-                    'free': disk.free,
-                    'percent': (disk.used / disk.total) * 100
-                },
-                'uptime': time.time() - psutil.boot_time()
-            }
-            
-            emit('system_info', system_info)
-            
+            emit('system_info', metrics_sampler.latest())
         except Exception as e:
             emit('error', {'message': f'Erro ao obter informações do sistema: {str(e)}'})
     
+    @socketio.on('metrics_subscribe')
+    def handle_metrics_subscribe():
+        """Inscreve o cliente nas atualizações de métricas (apenas valores alterados)"""
+        from src.routes.system import metrics_sampler, METRICS_ROOM
+        
+        join_room(METRICS_ROOM)
+        emit('system_info', metrics_sampler.latest())
+    
+    @socketio.on('metrics_unsubscribe')
+    def handle_metrics_unsubscribe():
+        """Cancela a inscrição nas métricas"""
+        from src.routes.system import METRICS_ROOM
+        
+        leave_room(METRICS_ROOM)
+    
+    @socketio.on('bot_resources_subscribe')
+    def handle_bot_resources_subscribe():
+        """Inscreve o cliente na telemetria de recursos do bot"""
+        from src.routes.system import metrics_sampler, BOT_ROOM
+        
+        metrics_sampler.start()
+        join_room(BOT_ROOM)
+        emit('bot_resources', metrics_sampler.bot_tracker.summary())
+    
+    @socketio.on('bot_resources_unsubscribe')
+    def handle_bot_resources_unsubscribe():
+        """Cancela a telemetria de recursos do bot"""
+        from src.routes.system import BOT_ROOM
+        
+        leave_room(BOT_ROOM)
+    
+    @socketio.on('bot_config_subscribe')
+    def handle_bot_config_subscribe():
+        """Inscreve o cliente nas mudanças do config.json do bot"""
+        join_room(config_store.CONFIG_ROOM)
+        bot.config_store.subscribe(request.sid)
+        try:
+            current = bot.config_store.get()
+            emit('bot_config', {'config': current['config'], 'hash': current['hash']})
+        except FileNotFoundError:
+            emit('error', {'message': 'Arquivo de configuração não encontrado'})
+    
+    @socketio.on('bot_config_unsubscribe')
+    def handle_bot_config_unsubscribe():
+        """Cancela a inscrição nas mudanças do config.json"""
+        leave_room(config_store.CONFIG_ROOM)
+        bot.config_store.unsubscribe(request.sid)
+    
+    @socketio.on('watch_directory')
+    def handle_watch_directory(data):
+        """Inscreve o cliente nas mudanças de um diretório aberto no gerenciador de arquivos"""
+        try:
+            path = fs_watcher.directory_watcher.watch(request.sid, (data or {}).get('path', ''))
+        except ValueError as e:
+            emit('error', {'message': str(e)})
+            return
+        
+        join_room(fs_watcher.watch_room(path))
+        emit('directory_watched', {'path': path, **fs_watcher.directory_watcher.stats()})
+    
+    @socketio.on('unwatch_directory')
+    def handle_unwatch_directory(data):
+        """Cancela a inscrição nas mudanças de um diretório"""
+        path = (data or {}).get('path', '').strip('/')
+        fs_watcher.directory_watcher.unwatch(request.sid, path)
+        leave_room(fs_watcher.watch_room(path))
+    
     @socketio.on('ping')
     def handle_ping():
         """Responde a ping do cliente"""
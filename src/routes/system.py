@@ -0,0 +1,350 @@
+import os
+import threading
+import time
+from collections import deque
+from flask import Blueprint, request, jsonify
+import psutil
+
+system_bp = Blueprint('system', __name__)
+
+# Instância do SocketIO usada para transmitir as métricas (definida em register_socket_events)
+socketio = None
+
+# Intervalo entre amostras (segundos) e quantidade de amostras mantidas no histórico
+METRICS_INTERVAL = float(os.environ.get('METRICS_INTERVAL', 2))
+METRICS_HISTORY = 300
+METRICS_ROOM = 'metrics'
+
+# Telemetria da árvore de processos do bot (npm -> node -> ...)
+BOT_HISTORY = 1800
+BOT_ROOM = 'bot_resources'
+
+def flatten(data, prefix=''):
+    """Achata um dicionário aninhado em chaves separadas por ponto"""
+    items = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            items.update(flatten(value, f'{name}.'))
+        else:
+            items[name] = value
+    return items
+
+def percentiles(values, points=(50, 95, 99)):
+    """Percentis por posição mais próxima (nearest-rank)"""
+    if not values:
+        return {f'p{p}': None for p in points}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+        result[f'p{p}'] = ordered[index]
+    return result
+
+def linear_slope(points):
+    """Inclinação (mínimos quadrados) de uma série de pares (x, y)"""
+    n = len(points)
+    if n < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+class BotResourceTracker:
+    """Agrega CPU, memória, descritores, threads e I/O de toda a árvore do bot.
+
+    O bot roda como ``npm`` com ``node`` (e eventuais filhos) abaixo dele;
+    olhar só o PID do npm esconde quase todo o consumo. Os objetos
+    ``psutil.Process`` são reaproveitados entre amostras para que
+    ``cpu_percent`` meça o intervalo desde a amostra anterior.
+    """
+
+    def __init__(self, history=BOT_HISTORY):
+        self.samples = deque(maxlen=history)
+        self.processes = {}
+        self.root_pid = None
+        self.lock = threading.Lock()
+
+    def _process(self, pid):
+        proc = self.processes.get(pid)
+        if proc is None:
+            proc = psutil.Process(pid)
+            proc.cpu_percent(interval=None)
+            self.processes[pid] = proc
+        return proc
+
+    def sample(self, pid):
+        """Coleta uma amostra agregada da árvore cujo processo raiz é ``pid``"""
+        if pid != self.root_pid:
+            # Novo processo do bot: o histórico anterior não é comparável
+            self.processes = {}
+            self.root_pid = pid
+            with self.lock:
+                self.samples.clear()
+
+        if pid is None:
+            return None
+
+        try:
+            root = self._process(pid)
+            tree = [root] + root.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+        totals = {'cpu_percent': 0.0, 'memory_rss': 0, 'num_fds': 0, 'num_threads': 0}
+        io = {'read_bytes': 0, 'write_bytes': 0, 'read_count': 0, 'write_count': 0}
+        children = []
+        seen = set()
+
+        for child in tree:
+            try:
+                proc = self._process(child.pid)
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(interval=None)
+                    rss = proc.memory_info().rss
+                    totals['cpu_percent'] += cpu
+                    totals['memory_rss'] += rss
+                    totals['num_threads'] += proc.num_threads()
+                    try:
+                        totals['num_fds'] += proc.num_fds()
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+                    try:
+                        counters = proc.io_counters()
+                        for key in io:
+                            io[key] += getattr(counters, key)
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+                    children.append({
+                        'pid': proc.pid,
+                        'name': proc.name(),
+                        'cpu_percent': cpu,
+                        'memory_rss': rss
+                    })
+                seen.add(proc.pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        # Esquece processos que já terminaram
+        for stale in set(self.processes) - seen:
+            del self.processes[stale]
+
+        try:
+            status = root.status()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            status = None
+
+        sample = {
+            'timestamp': time.time(),
+            'pid': pid,
+            'status': status,
+            'processes': len(children),
+            'cpu_percent': round(totals['cpu_percent'], 1),
+            'memory_rss': totals['memory_rss'],
+            'num_fds': totals['num_fds'],
+            'num_threads': totals['num_threads'],
+            'io': io,
+            'children': children
+        }
+        with self.lock:
+            self.samples.append(sample)
+        return sample
+
+    def history(self, limit=None):
+        """Amostras mais recentes (sem a lista de processos filhos)"""
+        with self.lock:
+            samples = list(self.samples)
+        if limit is not None:
+            samples = samples[-limit:] if limit > 0 else []
+        return [{k: v for k, v in s.items() if k != 'children'} for s in samples]
+
+    def summary(self):
+        """Amostra atual, percentis da janela e tendência de crescimento do RSS"""
+        with self.lock:
+            samples = list(self.samples)
+        if not samples:
+            return None
+
+        start = samples[0]['timestamp']
+        slope = linear_slope([(s['timestamp'] - start, s['memory_rss']) for s in samples])
+        return {
+            'current': samples[-1],
+            'window': samples[-1]['timestamp'] - start,
+            'samples': len(samples),
+            'percentiles': {
+                'cpu_percent': percentiles([s['cpu_percent'] for s in samples]),
+                'memory_rss': percentiles([s['memory_rss'] for s in samples]),
+                'num_fds': percentiles([s['num_fds'] for s in samples])
+            },
+            'rss_growth_per_hour': round(slope * 3600) if slope is not None else None
+        }
+
+class MetricsSampler:
+    """Coleta as métricas do sistema em uma única thread de fundo.
+
+    Os handlers HTTP e SocketIO respondem a partir da última amostra em
+    cache, sem nunca medir por conta própria. A cada amostra, apenas os
+    valores que mudaram são enviados para a sala ``METRICS_ROOM``.
+    """
+
+    def __init__(self, interval=METRICS_INTERVAL, history=METRICS_HISTORY):
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_broadcast = {}
+        self._last_net = None
+        self.bot_tracker = BotResourceTracker()
+
+    def start(self):
+        """Inicia a thread de coleta (uma única vez)"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            # A primeira chamada de cpu_percent só define a referência
+            psutil.cpu_percent(interval=None)
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _bot_stats(self):
+        from src.routes.bot import bot_supervisor
+
+        stats = self.bot_tracker.sample(bot_supervisor.pid)
+        if stats is None:
+            return None
+        return {
+            'pid': stats['pid'],
+            'status': stats['status'],
+            'processes': stats['processes'],
+            'cpu_percent': stats['cpu_percent'],
+            'memory_rss': stats['memory_rss'],
+            'num_threads': stats['num_threads'],
+            'num_fds': stats['num_fds']
+        }
+
+    def sample(self):
+        """Coleta uma amostra sem bloquear (cpu_percent usa o intervalo desde a última)"""
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        net = psutil.net_io_counters()
+
+        sent_rate = recv_rate = 0.0
+        if self._last_net is not None:
+            last_time, last_net = self._last_net
+            elapsed = now - last_time
+            if elapsed > 0:
+                sent_rate = (net.bytes_sent - last_net.bytes_sent) / elapsed
+                recv_rate = (net.bytes_recv - last_net.bytes_recv) / elapsed
+        self._last_net = (now, net)
+
+        sample = {
+            'timestamp': now,
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'memory': {
+                'total': memory.total,
+                'available': memory.available,
+                'percent': memory.percent,
+                'used': memory.used
+            },
+            'disk': {
+                'total': disk.total,
+                'used': disk.used,
+                'free': disk.free,
+                'percent': (disk.used / disk.total) * 100
+            },
+            'network': {
+                'bytes_sent': net.bytes_sent,
+                'bytes_recv': net.bytes_recv,
+                'sent_rate': round(sent_rate, 1),
+                'recv_rate': round(recv_rate, 1)
+            },
+            'bot': self._bot_stats(),
+            'uptime': now - psutil.boot_time()
+        }
+
+        with self.lock:
+            self.samples.append(sample)
+        return sample
+
+    def latest(self):
+        """Última amostra (coleta uma imediatamente se ainda não houver nenhuma)"""
+        self.start()
+        with self.lock:
+            if self.samples:
+                return self.samples[-1]
+        return self.sample()
+
+    def history(self, limit=None, since=None):
+        """Amostras do histórico, opcionalmente após ``since`` e limitadas às ``limit`` mais recentes"""
+        with self.lock:
+            samples = list(self.samples)
+        if since is not None:
+            samples = [s for s in samples if s['timestamp'] > since]
+        if limit is not None:
+            samples = samples[-limit:] if limit > 0 else []
+        return samples
+
+    def _broadcast(self, sample):
+        flat = flatten({k: v for k, v in sample.items() if k not in ('bot', 'timestamp')})
+        flat['bot'] = sample['bot']
+        changes = {k: v for k, v in flat.items() if self.last_broadcast.get(k) != v}
+        self.last_broadcast = flat
+
+        if changes and socketio is not None:
+            socketio.emit('system_info_delta', {
+                'timestamp': sample['timestamp'],
+                'changes': changes
+            }, to=METRICS_ROOM)
+
+        if sample['bot'] is not None and socketio is not None:
+            socketio.emit('bot_resources', self.bot_tracker.summary(), to=BOT_ROOM)
+
+    def _run(self):
+        while True:
+            try:
+                self._broadcast(self.sample())
+            except Exception as e:
+                print(f"Erro ao coletar métricas do sistema: {e}")
+            time.sleep(self.interval)
+
+# Coletor compartilhado por todas as rotas e eventos
+metrics_sampler = MetricsSampler()
+
+@system_bp.route('/info', methods=['GET'])
+def system_info():
+    """Retorna a última amostra de métricas do sistema"""
+    try:
+        return jsonify({
+            'success': True,
+            'info': metrics_sampler.latest(),
+            'interval': metrics_sampler.interval
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao obter informações do sistema: {str(e)}'
+        }), 500
+
+@system_bp.route('/history', methods=['GET'])
+def system_history():
+    """Retorna o histórico recente de métricas"""
+    try:
+        limit = request.args.get('limit', type=int)
+        since = request.args.get('since', type=float)
+        metrics_sampler.start()
+
+        return jsonify({
+            'success': True,
+            'samples': metrics_sampler.history(limit=limit, since=since),
+            'interval': metrics_sampler.interval
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Erro ao obter histórico do sistema: {str(e)}'
+        }), 500
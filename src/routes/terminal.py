@@ -1,23 +1,279 @@
 import os
+import pty
+import termios
+import selectors
+import signal
+import struct
+import fcntl
+import codecs
 import subprocess
 import threading
 import time
+from collections import deque
 from flask import Blueprint, request, jsonify
 from flask_socketio import emit
+from src.routes.jobs import job_runner, JobQueueFull, JOB_DEFAULT_CWD, JOB_DEFAULT_TIMEOUT
 
 terminal_bp = Blueprint('terminal', __name__)
 
 # Dicionário para armazenar sessões de terminal ativas
 terminal_sessions = {}
 
+# Instância do SocketIO usada para enviar a saída (definida em register_socket_events)
+socketio = None
+
+# Parâmetros do envio da saída do PTY
+READ_CHUNK_SIZE = 65536        # bytes lidos do PTY por chamada
+FRAME_INTERVAL = 0.016         # janela de agrupamento da saída (~60 quadros/s)
+FRAME_MAX_BYTES = 32 * 1024    # tamanho máximo de cada quadro enviado
+OUTPUT_QUEUE_MAX = 256 * 1024  # saída pendente por sessão antes de parar de ler o PTY
+SCROLLBACK_MAX_BYTES = 256 * 1024  # histórico mantido por sessão para reconexões
+IDLE_TIMEOUT = 3600            # segundos sem entrada/saída antes de encerrar a sessão
+REAP_TIMEOUT = 1               # espera pelo fim do shell depois que o PTY fechou
+REAP_POLL_INTERVAL = 0.05      # verificação do fim do shell quando não há pidfd
+EXECUTE_WAIT = 30              # /execute espera o resultado por este tempo antes de devolver o job_id
+
+def terminal_room(session_id):
+    """Sala SocketIO que recebe a saída de uma sessão"""
+    return f'terminal_{session_id}'
+
+class PtyReactor:
+    """Laço de eventos único que atende os PTYs de todas as sessões.
+
+    Os descritores mestre são multiplexados com ``selectors`` (epoll no
+    Linux) em uma só thread. Ela só acorda quando há saída para ler, um
+    quadro agrupado para enviar ou uma sessão prestes a ficar ociosa; sem
+    sessões, fica bloqueada indefinidamente. Shells que terminam são
+    recolhidos aqui e sessões ociosas por ``IDLE_TIMEOUT`` são encerradas.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.sessions = {}
+        self.exiting = {}      # sessão com PTY fechado -> prazo para o shell terminar
+        self.commands = deque()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+
+    def register(self, session):
+        """Passa a atender a saída de uma sessão"""
+        self._call(self._add, session)
+
+    def unregister(self, session):
+        """Deixa de atender uma sessão e fecha o seu PTY"""
+        self._call(self._remove, session)
+
+    def _call(self, func, *args):
+        # Operações no seletor são feitas sempre pela thread do reator
+        with self.lock:
+            self.commands.append((func, args))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+        try:
+            os.write(self.wake_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def _run_commands(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while True:
+            with self.lock:
+                if not self.commands:
+                    return
+                func, args = self.commands.popleft()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Erro no reator de terminais: {e}")
+
+    def _add(self, session):
+        if session.master_fd is None:
+            return
+        self.sessions[session.master_fd] = session
+        session.last_activity = time.monotonic()
+        self.selector.register(session.master_fd, selectors.EVENT_READ, session)
+
+        # Com pidfd (Linux 5.3+) o fim do shell também acorda o seletor
+        if hasattr(os, 'pidfd_open') and session.process:
+            try:
+                session.pidfd = os.pidfd_open(session.process.pid)
+                self.selector.register(session.pidfd, selectors.EVENT_READ, ('exit', session))
+            except OSError:
+                session.pidfd = None
+
+    def _remove(self, session):
+        if session.pidfd is not None:
+            self.selector.unregister(session.pidfd)
+            os.close(session.pidfd)
+            session.pidfd = None
+        self._close_master(session)
+
+    def _close_master(self, session):
+        fd = session.master_fd
+        if fd is None or self.sessions.get(fd) is not session:
+            return
+        del self.sessions[fd]
+        if not session.paused:
+            self.selector.unregister(fd)
+        session.master_fd = None
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+    def _pause(self, session):
+        """Para de ler um PTY cuja fila de saída está cheia"""
+        if not session.paused:
+            self.selector.unregister(session.master_fd)
+            session.paused = True
+
+    def _resume(self, session):
+        if session.paused and session.master_fd is not None:
+            self.selector.register(session.master_fd, selectors.EVENT_READ, session)
+            session.paused = False
+
+    def _next_timeout(self):
+        deadlines = [s.flush_deadline for s in self.sessions.values() if s.flush_deadline is not None]
+        deadlines.extend(s.last_activity + IDLE_TIMEOUT for s in self.sessions.values()
+                         if s.exit_reason is None)
+        now = time.monotonic()
+        for session, deadline in self.exiting.items():
+            # Com pidfd o fim do shell acorda o seletor; sem ele, verifica periodicamente
+            deadlines.append(deadline if session.pidfd is not None else min(deadline, now + REAP_POLL_INTERVAL))
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.monotonic())
+
+    def _read(self, session):
+        try:
+            data = os.read(session.master_fd, READ_CHUNK_SIZE)
+        except OSError:
+            # EIO: o shell terminou e o lado escravo foi fechado
+            data = b''
+
+        if not data:
+            self._reap(session)
+            return
+
+        session.last_activity = time.monotonic()
+        session._queue_output(data)
+        if len(session.output) >= OUTPUT_QUEUE_MAX:
+            self._pause(session)
+
+    def _drain(self, session):
+        """Lê o que ainda restar no PTY sem bloquear"""
+        if session.master_fd is None:
+            return
+        os.set_blocking(session.master_fd, False)
+        try:
+            while True:
+                data = os.read(session.master_fd, READ_CHUNK_SIZE)
+                if not data:
+                    break
+                session._queue_output(data)
+        except OSError:
+            pass
+
+    def _reap(self, session):
+        """Recolhe uma sessão cujo shell terminou (ou cujo PTY fechou)"""
+        if session.reaped:
+            self._collect(session)
+            return
+        session.reaped = True
+
+        self._drain(session)
+        while session.output:
+            session._flush_output()
+        self._close_master(session)
+        session.active = False
+
+        # Nunca espera aqui: a thread atende todos os terminais. Um shell que
+        # ainda não terminou é conferido pelo pidfd ou pela manutenção
+        self.exiting[session] = time.monotonic() + REAP_TIMEOUT
+        self._collect(session)
+
+    def _collect(self, session, now=None):
+        """Envia ``terminal_exit`` se o shell terminou ou o prazo de espera acabou"""
+        if session not in self.exiting:
+            return
+        return_code = session.process.poll() if session.process else None
+        if return_code is None and session.process and (now or time.monotonic()) < self.exiting[session]:
+            return
+        del self.exiting[session]
+        self._remove(session)
+
+        if terminal_sessions.get(session.session_id) is session:
+            del terminal_sessions[session.session_id]
+
+        if socketio is not None:
+            socketio.emit('terminal_exit', {
+                'session_id': session.session_id,
+                'return_code': return_code,
+                'reason': session.exit_reason or 'exit'
+            }, to=terminal_room(session.session_id))
+
+    def _housekeeping(self):
+        now = time.monotonic()
+        for session in list(self.exiting):
+            self._collect(session, now)
+        for session in list(self.sessions.values()):
+            if session.flush_deadline is not None and now >= session.flush_deadline:
+                session._flush_output()
+                if len(session.output) < OUTPUT_QUEUE_MAX:
+                    self._resume(session)
+
+            if session.process and session.process.poll() is not None:
+                # Shell morto sem EIO (ex.: leitura pausada ou filho segurando o PTY)
+                self._reap(session)
+            elif session.exit_reason is None and now - session.last_activity >= IDLE_TIMEOUT:
+                session.exit_reason = 'idle'
+                session.hangup()
+
+    def _run(self):
+        while True:
+            for key, _ in self.selector.select(self._next_timeout()):
+                if key.data is None:
+                    self._run_commands()
+                elif isinstance(key.data, tuple):
+                    self._reap(key.data[1])
+                elif key.fileobj in self.sessions:
+                    self._read(key.data)
+            self._housekeeping()
+
+# Reator compartilhado por todas as sessões de terminal
+pty_reactor = PtyReactor()
+
 class TerminalSession:
     def __init__(self, session_id):
         self.session_id = session_id
         self.master_fd = None
         self.slave_fd = None
         self.process = None
-        self.thread = None
         self.active = False
+        self.output = bytearray()
+        self.flush_deadline = None
+        self.paused = False
+        self.last_activity = time.monotonic()
+        self.exit_reason = None
+        self.pidfd = None
+        self.reaped = False
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # Histórico da saída já enviada: bytes [scrollback_start, sent_offset)
+        self.scrollback = bytearray()
+        self.scrollback_start = 0
+        self.sent_offset = 0
+        self.lock = threading.Lock()
     
     def start(self):
         """Inicia uma nova sessão de terminal"""
@@ -39,12 +295,14 @@ class TerminalSession:
                 preexec_fn=os.setsid
             )
             
+            # O lado escravo fica só com o shell; assim o fim do shell gera EIO no mestre
+            os.close(self.slave_fd)
+            self.slave_fd = None
+            
             self.active = True
             
-            # Inicia thread para ler a saída
-            self.thread = threading.Thread(target=self._read_output)
-            self.thread.daemon = True
-            self.thread.start()
+            # A leitura da saída é feita pelo reator compartilhado
+            pty_reactor.register(self)
             
             return True
             
@@ -52,29 +310,59 @@ class TerminalSession:
             print(f"Erro ao iniciar terminal: {e}")
             return False
     
-    def _read_output(self):
-        """Lê a saída do terminal e envia via WebSocket"""
-        while self.active and self.process.poll() is None:
-            try:
-                # Verifica se há dados para ler
-                ready, _, _ = select.select([self.master_fd], [], [], 0.1)
-                
-                if ready:
-                    data = os.read(self.master_fd, 1024)
-                    if data:
-                        output = data.decode('utf-8', errors='ignore')
-                        # Aqui você emitiria via SocketIO
-                        # emit('terminal_output', {'session_id': self.session_id, 'data': output})
-                        
-            except Exception as e:
-                print(f"Erro ao ler saída do terminal: {e}")
-                break
+    def _queue_output(self, data):
+        """Acumula saída do PTY para o próximo quadro"""
+        if not self.output:
+            self.flush_deadline = time.monotonic() + FRAME_INTERVAL
+        self.output.extend(data)
+    
+    def _flush_output(self):
+        """Envia um quadro com a saída acumulada para a sala da sessão"""
+        if not self.output:
+            self.flush_deadline = None
+            return
+        
+        frame = bytes(self.output[:FRAME_MAX_BYTES])
+        del self.output[:FRAME_MAX_BYTES]
+        self.flush_deadline = time.monotonic() + FRAME_INTERVAL if self.output else None
+        
+        # O envio acontece sob o lock para não intercalar com um attach
+        with self.lock:
+            start = self.sent_offset
+            self.sent_offset += len(frame)
+            self.scrollback.extend(frame)
+            excess = len(self.scrollback) - SCROLLBACK_MAX_BYTES
+            if excess > 0:
+                del self.scrollback[:excess]
+                self.scrollback_start += excess
+            
+            text = self.decoder.decode(frame)
+            if text and socketio is not None:
+                socketio.emit('terminal_output', {
+                    'session_id': self.session_id,
+                    'data': text,
+                    'start': start,
+                    'offset': self.sent_offset
+                }, to=terminal_room(self.session_id))
+    
+    def scrollback_since(self, offset):
+        """Retorna a saída enviada a partir de ``offset`` (chamar com ``lock``).
+
+        Devolve ``(texto, início, fim, truncado)``; ``truncado`` indica que
+        parte do intervalo pedido já saiu do histórico.
+        """
+        offset = max(0, min(offset, self.sent_offset))
+        start = max(offset, self.scrollback_start)
+        data = bytes(self.scrollback[start - self.scrollback_start:])
+        text = codecs.decode(data, 'utf-8', errors='replace')
+        return text, start, self.sent_offset, start > offset
     
     def write_input(self, data):
         """Escreve dados no terminal"""
         try:
-            if self.master_fd and self.active:
+            if self.master_fd is not None and self.active:
                 os.write(self.master_fd, data.encode('utf-8'))
+                self.last_activity = time.monotonic()
                 return True
         except Exception as e:
             print(f"Erro ao escrever no terminal: {e}")
@@ -83,7 +371,7 @@ class TerminalSession:
     def resize(self, rows, cols):
         """Redimensiona o terminal"""
         try:
-            if self.master_fd:
+            if self.master_fd is not None:
                 winsize = struct.pack('HHHH', rows, cols, 0, 0)
                 fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, winsize)
                 return True
@@ -91,13 +379,22 @@ class TerminalSession:
             print(f"Erro ao redimensionar terminal: {e}")
         return False
     
+    def hangup(self):
+        """Envia SIGHUP ao grupo de processos do shell, como ao fechar um terminal"""
+        try:
+            os.killpg(self.process.pid, signal.SIGHUP)
+        except (OSError, AttributeError):
+            pass
+    
     def close(self):
         """Fecha a sessão do terminal"""
         self.active = False
+        self.exit_reason = self.exit_reason or 'closed'
         
         if self.process:
             try:
-                self.process.terminate()
+                # Shells interativos ignoram SIGTERM; SIGHUP encerra o grupo todo
+                self.hangup()
                 self.process.wait(timeout=5)
             except:
                 try:
@@ -105,17 +402,8 @@ class TerminalSession:
                 except:
                     pass
         
-        if self.master_fd:
-            try:
-                os.close(self.master_fd)
-            except:
-                pass
-        
-        if self.slave_fd:
-            try:
-                os.close(self.slave_fd)
-            except:
-                pass
+        # O reator remove o descritor do seletor e fecha o PTY
+        pty_reactor.unregister(self)
 
 @terminal_bp.route('/create', methods=['POST'])
 def create_terminal():
@@ -124,9 +412,21 @@ def create_terminal():
         data = request.get_json() or {}
         session_id = data.get('session_id', 'default')
         
+        # Reaproveita a sessão existente (ex.: reconexão), a menos que peçam para substituir
+        existing = terminal_sessions.get(session_id)
+        if existing is not None and existing.active and not data.get('replace', False):
+            return jsonify({
+                'success': True,
+                'session_id': session_id,
+                'reattached': True,
+                'offset': existing.sent_offset,
+                'message': 'Sessão de terminal existente reaproveitada'
+            })
+        
         # Remove sessão existente se houver
-        if session_id in terminal_sessions:
-            terminal_sessions[session_id].close()
+        if existing is not None:
+            terminal_sessions.pop(session_id, None)
+            existing.close()
         
         # Cria nova sessão
         session = TerminalSession(session_id)
@@ -151,7 +451,13 @@ def create_terminal():
 
 @terminal_bp.route('/execute', methods=['POST'])
 def execute_command():
-    """Executa um comando no terminal"""
+    """Executa um comando no terminal.
+
+    O comando roda no pool de jobs (``/api/terminal/jobs``); a requisição
+    espera até ``EXECUTE_WAIT`` segundos pelo resultado. Com ``async`` ou
+    se o comando demorar mais, responde 202 com o ``job_id`` para
+    acompanhar a saída sem prender a requisição.
+    """
     try:
         data = request.get_json()
         if not data or 'command' not in data:
@@ -161,31 +467,36 @@ def execute_command():
             }), 400
         
         command = data['command']
-        session_id = data.get('session_id', 'default')
         
-        # Executa comando simples (sem sessão persistente)
         try:
-            result = subprocess.run(
+            job = job_runner.submit(
                 command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                cwd='/home/ubuntu'
+                cwd=data.get('cwd') or JOB_DEFAULT_CWD,
+                timeout=int(data.get('timeout', JOB_DEFAULT_TIMEOUT))
             )
-            
+        except JobQueueFull:
             return jsonify({
-                'success': True,
-                'output': result.stdout,
-                'error': result.stderr,
-                'return_code': result.returncode
-            })
-            
-        except subprocess.TimeoutExpired:
+                'success': False,
+                'message': 'Muitos comandos na fila, tente novamente em instantes'
+            }), 429
+        
+        if data.get('async') or not job.wait_done(timeout=EXECUTE_WAIT):
             return jsonify({
                 'success': False,
-                'message': 'Comando expirou (timeout de 30s)'
-            }), 408
+                'message': 'Comando em execução em segundo plano',
+                'job_id': job.id,
+                'status': job.status
+            }), 202
+        
+        result = job.to_dict(output=True)
+        return jsonify({
+            'success': result['status'] == 'finished',
+            'output': result['output'],
+            'error': result['stderr'] or result['error'] or '',
+            'return_code': result['return_code'],
+            'truncated': result['truncated'],
+            'job_id': job.id
+        })
             
     except Exception as e:
         return jsonify({
@@ -277,9 +588,9 @@ def close_terminal():
         data = request.get_json() or {}
         session_id = data.get('session_id', 'default')
         
-        if session_id in terminal_sessions:
-            terminal_sessions[session_id].close()
-            del terminal_sessions[session_id]
+        session = terminal_sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
         
         return jsonify({
             'success': True,
@@ -301,7 +612,8 @@ def list_sessions():
             if session.active:
                 active_sessions.append({
                     'session_id': session_id,
-                    'pid': session.process.pid if session.process else None
+                    'pid': session.process.pid if session.process else None,
+                    'offset': session.sent_offset
                 })
         
         return jsonify({
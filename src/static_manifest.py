@@ -0,0 +1,152 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from io import BytesIO
+from flask import send_file
+
+try:
+    import brotli
+except ImportError:  # está no requirements.txt, mas sem ele (ex.: sem wheel no Termux) só .br já existentes são usados
+    brotli = None
+
+# Arquivos do build com hash no nome (ex.: assets/index-Bxv8TugE.js) nunca mudam de conteúdo
+HASHED_ASSET_RE = re.compile(r'(^|/)assets/[^/]+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Só vale a pena comprimir texto; imagens e fontes já são comprimidas
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json',
+                      'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon')
+COMPRESS_MIN_SIZE = 1024
+
+# Codificações em ordem de preferência e a extensão dos arquivos irmãos
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+class StaticManifest:
+    """Índice em memória da pasta ``static/`` montado na inicialização.
+
+    Para cada arquivo guarda tamanho, hash, tipo MIME e as variantes
+    comprimidas (``.br``/``.gz``). Variantes ausentes são geradas uma vez,
+    gravadas ao lado do original ou mantidas em memória se a pasta não
+    aceitar escrita. Assim o atendimento de cada requisição não precisa
+    consultar o sistema de arquivos para decidir o que enviar.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.files = {}
+        self.build()
+
+    def build(self):
+        files = {}
+        sibling_exts = tuple(ext for _, ext in ENCODINGS)
+
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(sibling_exts):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                try:
+                    files[rel_path] = self._entry(full_path, rel_path)
+                except OSError as e:
+                    print(f"Erro ao indexar arquivo estático {rel_path}: {e}")
+
+        self.files = files
+
+    def _entry(self, full_path, rel_path):
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        stat = os.stat(full_path)
+        mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+        entry = {
+            'path': full_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': hashlib.sha1(data).hexdigest(),
+            'mimetype': mimetype,
+            'immutable': bool(HASHED_ASSET_RE.search(rel_path)),
+            'variants': {}
+        }
+
+        if len(data) >= COMPRESS_MIN_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES):
+            for encoding, ext in ENCODINGS:
+                variant = self._variant(full_path, data, stat, encoding, ext)
+                if variant is not None:
+                    entry['variants'][encoding] = variant
+        return entry
+
+    def _variant(self, full_path, data, stat, encoding, ext):
+        sibling = full_path + ext
+        try:
+            if os.stat(sibling).st_mtime >= stat.st_mtime:
+                return {'path': sibling, 'data': None, 'size': os.path.getsize(sibling)}
+        except OSError:
+            pass
+
+        if encoding == 'gzip':
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        elif encoding == 'br' and brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+        else:
+            return None
+
+        # Só compensa se a variante for realmente menor
+        if len(compressed) >= len(data) * 0.9:
+            return None
+
+        try:
+            tmp_path = f'{sibling}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, sibling)
+            return {'path': sibling, 'data': None, 'size': len(compressed)}
+        except OSError:
+            # Pasta somente leitura: mantém a variante em memória
+            return {'path': None, 'data': compressed, 'size': len(compressed)}
+
+    def get(self, rel_path):
+        return self.files.get(rel_path)
+
+    def send(self, rel_path, accept_encodings):
+        """Envia um arquivo do manifesto escolhendo a codificação pelo Accept-Encoding"""
+        entry = self.files[rel_path]
+
+        encoding = None
+        for candidate, _ in ENCODINGS:
+            if candidate in entry['variants'] and accept_encodings[candidate] > 0:
+                encoding = candidate
+                break
+
+        if encoding:
+            variant = entry['variants'][encoding]
+            source = variant['path'] or BytesIO(variant['data'])
+            etag = f"{entry['hash']}-{encoding}"
+        else:
+            source = entry['path']
+            etag = entry['hash']
+
+        response = send_file(
+            source,
+            mimetype=entry['mimetype'],
+            download_name=os.path.basename(rel_path),
+            etag=etag,
+            last_modified=entry['mtime'],
+            max_age=IMMUTABLE_MAX_AGE if entry['immutable'] else None,
+            conditional=True
+        )
+
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['variants']:
+            response.vary.add('Accept-Encoding')
+
+        if entry['immutable']:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        else:
+            # index.html e afins: sempre revalidar (o ETag evita baixar de novo)
+            response.cache_control.no_cache = True
+        return response
@@ -110,5 +110,7 @@ print(f'Nazuna existe: {os.path.exists(\"nazuna\")}')
 log "Iniciando Nazuna Panel..."
 info "Acesse o painel em: http://localhost:5000"
 
+# Servidor com threads por padrão; PANEL_MODE=production ativa o gevent (ver deploy-guides/vps-ubuntu.md)
+export PANEL_MODE="${PANEL_MODE:-development}"
 exec $PYTHON_CMD src/main.py
 